@@ -0,0 +1,130 @@
+"""Модуль асинхронного чтения для вьюсетов DRF.
+
+DRF выполняет view синхронно, и под ASGI каждый запрос занимает
+поток на всё время ожидания БД. Если включена настройка
+`ASYNC_READ_VIEWS` (её включает `foodgram/asgi.py`), GET-запросы
+списка и страницы объекта обрабатываются корутинами: аутентификация,
+фильтры и кэш вызываются через `sync_to_async`, а выборки читаются
+асинхронными методами ORM. Остальные методы выполняются прежним
+синхронным кодом в пуле потоков.
+"""
+
+import asyncio
+from functools import update_wrapper
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.http import Http404
+from django.utils.decorators import classonlymethod
+
+from asgiref.sync import sync_to_async
+from rest_framework.response import Response
+
+
+def in_event_loop():
+    """Проверяет, выполняется ли код в потоке цикла событий."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+class AsyncReadMixin:
+    """Примесь вьюсета с асинхронными `list` и `retrieve`.
+
+    Ставится перед базовым классом вьюсета. Примеси, которые
+    переопределяют `list` и `retrieve`, переопределяют и их
+    асинхронные варианты `alist` и `aretrieve`.
+
+    Атрибут:
+        async_actions (tuple): Действия, которые в режиме ASGI
+            выполняются методами `a<действие>`.
+    """
+
+    async_actions = ('list', 'retrieve')
+
+    @classonlymethod
+    def as_view(cls, actions=None, **initkwargs):
+        """Возвращает асинхронную view для маршрутов чтения."""
+        view = super().as_view(actions, **initkwargs)
+        if not (getattr(settings, 'ASYNC_READ_VIEWS', False)
+                and actions.get('get') in cls.async_actions):
+            return view
+        sync_view = sync_to_async(view)
+
+        async def async_view(request, *args, **kwargs):
+            if request.method in ('GET', 'HEAD'):
+                return await view(request, *args, **kwargs)
+            return await sync_view(request, *args, **kwargs)
+
+        return update_wrapper(async_view, view)
+
+    def dispatch(self, request, *args, **kwargs):
+        """В цикле событий возвращает корутину `adispatch`."""
+        action = self.action_map.get(request.method.lower())
+        if action in self.async_actions and in_event_loop():
+            return self.adispatch(request, *args, **kwargs)
+        return super().dispatch(request, *args, **kwargs)
+
+    async def adispatch(self, request, *args, **kwargs):
+        """Асинхронный вариант `APIView.dispatch` для чтения."""
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            handler = getattr(self, f'a{self.action}')
+            response = await handler(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+        self.response = self.finalize_response(
+            request, response, *args, **kwargs)
+        return self.response
+
+    async def alist(self, request, *args, **kwargs):
+        """Асинхронный вариант `ListModelMixin.list`."""
+        queryset = await sync_to_async(self.filter_queryset)(
+            self.get_queryset())
+        page = await self.apaginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        serializer = self.get_serializer(
+            [obj async for obj in queryset], many=True)
+        return Response(serializer.data)
+
+    async def aretrieve(self, request, *args, **kwargs):
+        """Асинхронный вариант `RetrieveModelMixin.retrieve`."""
+        serializer = self.get_serializer(await self.aget_object())
+        return Response(serializer.data)
+
+    async def aget_object(self):
+        """Асинхронный вариант `GenericAPIView.get_object`."""
+        queryset = await sync_to_async(self.filter_queryset)(
+            self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            obj = await queryset.aget(
+                **{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        except (queryset.model.DoesNotExist, TypeError, ValueError,
+                ValidationError):
+            raise Http404
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+    async def apaginate_queryset(self, queryset):
+        """Асинхронный вариант `GenericAPIView.paginate_queryset`.
+
+        Пагинатор без `apaginate_queryset` вызывается в пуле потоков.
+        """
+        paginator = self.paginator
+        if paginator is None:
+            return None
+        if hasattr(paginator, 'apaginate_queryset'):
+            return await paginator.apaginate_queryset(
+                queryset, self.request, view=self)
+        return await sync_to_async(paginator.paginate_queryset)(
+            queryset, self.request, view=self)
@@ -0,0 +1,228 @@
+"""Модуль кэширования ответов API для справочников и рецептов.
+
+Справочники ингредиентов и тегов меняются редко, поэтому готовый JSON
+хранится в LRU-кэше процесса и, при наличии, в общем кэше Django.
+Так же кэшируются ответы на анонимные запросы списка и страницы
+рецептов. Ключ и ETag строятся из поколения данных и строки запроса,
+поэтому условный запрос с совпавшим `If-None-Match` получает `304`
+без обращения к БД.
+"""
+
+import hashlib
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from django.http import HttpResponse
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+
+from asgiref.sync import sync_to_async
+from rest_framework.permissions import SAFE_METHODS
+
+from recipes.cache import get_cache, get_generation
+from recipes.constants import CATALOGUE_CACHE_SIZE, CATALOGUE_CACHE_TIMEOUT
+
+
+class LRUCache:
+    """Потокобезопасный LRU-кэш фиксированного размера."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key):
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                return None
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class CatalogueCache:
+    """Двухуровневый кэш сериализованных справочников."""
+
+    def __init__(self, maxsize=CATALOGUE_CACHE_SIZE,
+                 timeout=CATALOGUE_CACHE_TIMEOUT):
+        self.local = LRUCache(maxsize)
+        self.timeout = timeout
+
+    def make_key(self, namespace, request):
+        """Строит ключ из поколения справочника, формата, пути и параметров."""
+        query = '&'.join(
+            f'{name}={value}'
+            for name, values in sorted(request.query_params.lists())
+            for value in sorted(values))
+        raw = f'{request.accepted_media_type}:{request.path}?{query}'
+        digest = hashlib.md5(raw.encode()).hexdigest()
+        return f'catalogue:{namespace}:{get_generation(namespace)}:{digest}'
+
+    @staticmethod
+    def make_etag(key):
+        """Возвращает ETag для ключа кэша."""
+        return '"{}"'.format(hashlib.md5(key.encode()).hexdigest())
+
+    def get(self, key):
+        """Возвращает пару (тело ответа, время создания) или `None`."""
+        entry = self.local.get(key)
+        if entry is None:
+            entry = get_cache().get(key)
+            if entry is not None:
+                self.local.set(key, entry)
+        return entry
+
+    def set(self, key, body):
+        """Сохраняет тело ответа и возвращает запись кэша."""
+        entry = (body, int(time.time()))
+        self.local.set(key, entry)
+        get_cache().set(key, entry, timeout=self.timeout)
+        return entry
+
+
+catalogue_cache = CatalogueCache()
+
+
+class CatalogueCacheMixin:
+    """Примесь для вьюсетов справочников с кэшем и ответами `304`.
+
+    Атрибут `catalogue_namespace` задаёт поколение, которое
+    увеличивается сигналами при изменении данных справочника.
+    """
+
+    catalogue_namespace = None
+
+    def perform_authentication(self, request):
+        """Откладывает аутентификацию для чтения справочника.
+
+        Справочники доступны всем, поэтому токен не нужно проверять
+        запросом к БД до того, как понадобится пользователь.
+        """
+        if request.method not in SAFE_METHODS:
+            super().perform_authentication(request)
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            super().retrieve, request, *args, **kwargs)
+
+    async def alist(self, request, *args, **kwargs):
+        return await self.aget_cached_response(
+            super().alist, request, *args, **kwargs)
+
+    async def aretrieve(self, request, *args, **kwargs):
+        return await self.aget_cached_response(
+            super().aretrieve, request, *args, **kwargs)
+
+    def get_cached_response(self, handler, request, *args, **kwargs):
+        """Отдаёт ответ из кэша или формирует и кэширует его."""
+        if request.accepted_renderer.format != 'json':
+            return handler(request, *args, **kwargs)
+        key, entry = self.get_cache_entry(request)
+        etag = catalogue_cache.make_etag(key)
+        not_modified = self.is_not_modified(request, etag, entry)
+        if not not_modified and entry is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            entry = self.set_cache_entry(key, request, response)
+        return self.make_cached_response(
+            request, etag, entry, not_modified)
+
+    async def aget_cached_response(self, handler, request, *args, **kwargs):
+        """Асинхронный вариант `get_cached_response`."""
+        if request.accepted_renderer.format != 'json':
+            return await handler(request, *args, **kwargs)
+        key, entry = await sync_to_async(self.get_cache_entry)(request)
+        etag = catalogue_cache.make_etag(key)
+        not_modified = self.is_not_modified(request, etag, entry)
+        if not not_modified and entry is None:
+            response = await handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            entry = await sync_to_async(self.set_cache_entry)(
+                key, request, response)
+        return self.make_cached_response(
+            request, etag, entry, not_modified)
+
+    def get_cache_entry(self, request):
+        """Возвращает ключ кэша запроса и запись кэша или `None`."""
+        key = catalogue_cache.make_key(self.catalogue_namespace, request)
+        return key, catalogue_cache.get(key)
+
+    def set_cache_entry(self, key, request, response):
+        """Рендерит ответ и сохраняет его в кэш."""
+        return catalogue_cache.set(key, request.accepted_renderer.render(
+            response.data, request.accepted_media_type,
+            self.get_renderer_context()))
+
+    @staticmethod
+    def make_cached_response(request, etag, entry, not_modified):
+        """Строит ответ из записи кэша или ответ `304`."""
+        if not_modified:
+            response = HttpResponse(status=304)
+        else:
+            response = HttpResponse(
+                entry[0], content_type=request.accepted_media_type)
+        response['ETag'] = etag
+        if entry is not None:
+            response['Last-Modified'] = http_date(entry[1])
+        return response
+
+    @staticmethod
+    def is_not_modified(request, etag, entry):
+        """Проверяет условные заголовки запроса.
+
+        `If-Modified-Since` учитывается, только если нет
+        `If-None-Match` и ответ уже есть в кэше.
+        """
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match:
+            return (etag in parse_etags(if_none_match)
+                    or if_none_match.strip() == '*')
+        if_modified_since = parse_http_date_safe(
+            request.META.get('HTTP_IF_MODIFIED_SINCE'))
+        return (entry is not None and if_modified_since is not None
+                and entry[1] <= if_modified_since)
+
+
+class RecipeCacheMixin(CatalogueCacheMixin):
+    """Примесь вьюсета рецептов с кэшем ответов анонимным пользователям.
+
+    Ответы авторизованным пользователям содержат их флаги избранного
+    и списка покупок, поэтому формируются без кэша.
+    """
+
+    catalogue_namespace = 'recipes'
+
+    def perform_authentication(self, request):
+        """Аутентифицирует сразу: от пользователя зависит ответ."""
+        request.user
+
+    def get_cached_response(self, handler, request, *args, **kwargs):
+        """Кэширует только ответы на анонимные запросы."""
+        if request.user.is_authenticated:
+            return handler(request, *args, **kwargs)
+        return super().get_cached_response(
+            handler, request, *args, **kwargs)
+
+    async def aget_cached_response(self, handler, request, *args, **kwargs):
+        """Асинхронный вариант `get_cached_response`."""
+        if request.user.is_authenticated:
+            return await handler(request, *args, **kwargs)
+        return await super().aget_cached_response(
+            handler, request, *args, **kwargs)
@@ -0,0 +1,142 @@
+"""Модуль условных ответов API.
+
+ETag вычисляется до сериализации: из максимального `updated_at`
+и числа строк выборки, поколений кэша, от которых зависит ответ,
+и отпечатка состояния пользователя, если в ответе есть его флаги.
+Запрос с совпавшим `If-None-Match` получает `304`, не загружая
+и не сериализуя объекты.
+"""
+
+import hashlib
+
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Max
+from django.utils.http import parse_etags
+
+from asgiref.sync import sync_to_async
+from rest_framework.response import Response
+
+from recipes.cache import get_generation
+from recipes.user_state import get_user_state
+
+
+class ConditionalGetMixin:
+    """Примесь вьюсета с ETag и ответами `304` для чтения.
+
+    Атрибуты:
+        etag_generations (tuple): Поколения кэша, которые меняются
+            при изменении данных ответа помимо `updated_at`.
+        etag_user_state (bool): Ответ содержит флаги текущего
+            пользователя из кэша его состояния.
+    """
+
+    etag_generations = ()
+    etag_user_state = False
+
+    def list(self, request, *args, **kwargs):
+        etag = self.get_etag(
+            request, self.filter_queryset(self.get_queryset()))
+        return self.get_conditional_response(
+            super().list, etag, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        queryset = self.filter_lookup(
+            self.filter_queryset(self.get_queryset()))
+        return self.get_conditional_response(
+            super().retrieve, self.get_etag(request, queryset),
+            request, *args, **kwargs)
+
+    async def alist(self, request, *args, **kwargs):
+        queryset = await sync_to_async(self.filter_queryset)(
+            self.get_queryset())
+        return await self.aget_conditional_response(
+            super().alist, await self.aget_etag(request, queryset),
+            request, *args, **kwargs)
+
+    async def aretrieve(self, request, *args, **kwargs):
+        queryset = self.filter_lookup(await sync_to_async(
+            self.filter_queryset)(self.get_queryset()))
+        return await self.aget_conditional_response(
+            super().aretrieve, await self.aget_etag(request, queryset),
+            request, *args, **kwargs)
+
+    def filter_lookup(self, queryset):
+        """Отбирает объект страницы; `None`, если ключ поиска неверен."""
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            return queryset.filter(
+                **{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        except (TypeError, ValueError, ValidationError):
+            return None
+
+    def get_conditional_response(self, handler, etag, request,
+                                 *args, **kwargs):
+        """Отвечает `304` по совпавшему ETag или вызывает `handler`."""
+        if self.etag_matches(request, etag):
+            response = Response(status=304)
+        else:
+            response = handler(request, *args, **kwargs)
+            if etag is None or response.status_code != 200:
+                return response
+        response['ETag'] = etag
+        return response
+
+    async def aget_conditional_response(self, handler, etag, request,
+                                        *args, **kwargs):
+        """Асинхронный вариант `get_conditional_response`."""
+        if self.etag_matches(request, etag):
+            response = Response(status=304)
+        else:
+            response = await handler(request, *args, **kwargs)
+            if etag is None or response.status_code != 200:
+                return response
+        response['ETag'] = etag
+        return response
+
+    @staticmethod
+    def etag_matches(request, etag):
+        """Проверяет, совпадает ли ETag с `If-None-Match` запроса."""
+        if etag is None:
+            return False
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        return bool(if_none_match) and (
+            etag in parse_etags(if_none_match)
+            or if_none_match.strip() == '*')
+
+    def get_etag(self, request, queryset):
+        """Возвращает ETag выборки или `None`, если она пуста."""
+        if queryset is None:
+            return None
+        stats = queryset.aggregate(
+            updated=Max('updated_at'), total=Count('pk'))
+        if not stats['total']:
+            return None
+        return self.make_etag(
+            request, stats['updated'].isoformat(), stats['total'])
+
+    async def aget_etag(self, request, queryset):
+        """Асинхронный вариант `get_etag`."""
+        if queryset is None:
+            return None
+        stats = await queryset.aaggregate(
+            updated=Max('updated_at'), total=Count('pk'))
+        if not stats['total']:
+            return None
+        return await sync_to_async(self.make_etag)(
+            request, stats['updated'].isoformat(), stats['total'])
+
+    def make_etag(self, request, *parts):
+        """Строит ETag из частей, параметров запроса и состояния."""
+        query = '&'.join(
+            f'{name}={value}'
+            for name, values in sorted(request.query_params.lists())
+            for value in sorted(values))
+        parts = [request.accepted_media_type, request.path, query, *parts]
+        parts += [get_generation(name) for name in self.etag_generations]
+        if self.etag_user_state:
+            state = get_user_state(request)
+            if state is not None:
+                parts.append(hashlib.md5(
+                    b''.join(state.to_cache())).hexdigest())
+        raw = ':'.join(str(part) for part in parts)
+        return '"{}"'.format(hashlib.md5(raw.encode()).hexdigest())
@@ -2,20 +2,25 @@
 
 import django_filters
 from django_filters import rest_framework as filters
+from rest_framework.filters import OrderingFilter
 
 from recipes.models import Ingredient, Recipe, Tag
+from recipes.search import autocomplete_ingredients, search_recipes
 
 
 class IngredientFilter(django_filters.FilterSet):
     """Фильтр для модели Ingredient."""
 
-    name = django_filters.CharFilter(field_name='name',
-                                     lookup_expr='icontains')
+    name = django_filters.CharFilter(method='filter_name')
 
     class Meta:
         model = Ingredient
         fields = ['name']
 
+    def filter_name(self, queryset, name, value):
+        """Автодополнение: сначала совпадения по началу названия."""
+        return autocomplete_ingredients(queryset, value)
+
 
 class RecipeFilter(django_filters.FilterSet):
     """Фильтр для модели Recipe."""
@@ -31,10 +36,12 @@ class RecipeFilter(django_filters.FilterSet):
         method='filter_is_favorited')
     is_in_shopping_cart = django_filters.BooleanFilter(
         method='filter_is_in_shopping_cart')
+    search = django_filters.CharFilter(method='filter_search')
 
     class Meta:
         model = Recipe
-        fields = ['author', 'tags', 'is_favorited', 'is_in_shopping_cart']
+        fields = ['author', 'tags', 'is_favorited', 'is_in_shopping_cart',
+                  'search']
 
     def filter_is_favorited(self, queryset, name, value):
         """Фильтруем рецепты по добавлению в избранное."""
@@ -47,3 +54,21 @@ class RecipeFilter(django_filters.FilterSet):
         if value:
             return queryset.filter(shopping_lists__user=self.request.user)
         return queryset
+
+    def filter_search(self, queryset, name, value):
+        """Полнотекстовый поиск по названию, ингредиентам и описанию."""
+        return search_recipes(queryset, value)
+
+
+class RecipeOrderingFilter(OrderingFilter):
+    """Сортировка рецептов, при поиске по умолчанию — по релевантности."""
+
+    def get_ordering(self, request, queryset, view):
+        """Возвращает сортировку; найденные рецепты идут по релевантности.
+
+        Явный параметр `ordering` имеет приоритет над релевантностью.
+        """
+        if (self.ordering_param not in request.query_params
+                and 'search_rank' in queryset.query.annotations):
+            return ['-search_rank', *self.get_default_ordering(view)]
+        return super().get_ordering(request, queryset, view)
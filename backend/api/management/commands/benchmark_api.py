@@ -0,0 +1,204 @@
+"""Команда Django для бенчмарка горячих эндпоинтов API."""
+
+import json
+import statistics
+import subprocess
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+
+from api.cache import catalogue_cache
+from recipes.cache import get_cache
+from recipes.models import Ingredient, Recipe
+from users.models import User
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+def percentile(values, share):
+    """Возвращает перцентиль `share` (в процентах) для списка значений."""
+    values = sorted(values)
+    return values[min(int(len(values) * share / 100), len(values) - 1)]
+
+
+class Command(BaseCommand):
+    """Класс команды для замера задержек и числа SQL-запросов эндпоинтов.
+
+    Запросы выполняются тестовым клиентом Django к текущей базе, поэтому
+    перед запуском её стоит заполнить командой `generate_fake_data`.
+    Перед каждой итерацией очищаются кэш API (ответы, состояние
+    пользователей, поколения) и локальный кэш справочников, чтобы
+    замерялся путь через БД; с `--warm` кэши не очищаются и замеряются
+    ответы из кэша. Кэш API очищается целиком, поэтому команду не стоит
+    запускать с общим кэшем работающего сервера.
+    Результат выводится в JSON; с `--compare` к каждому сценарию
+    добавляется сравнение с сохранённым ранее прогоном.
+
+    Атрибут:
+        help (str): Описание команды для `manage.py help`.
+    """
+
+    help = 'Замеряет задержки и SQL-запросы горячих эндпоинтов API'
+
+    def add_arguments(self, parser):
+        """
+        Добавляет аргументы командной строки.
+
+        Аргументы:
+            parser (ArgumentParser): Объект парсера аргументов.
+        """
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--limit', type=int, default=6,
+                            help='Размер страницы списка рецептов.')
+        parser.add_argument('--scenario', action='append', default=None,
+                            help='Запустить только указанный сценарий.')
+        parser.add_argument('--output', type=str, default='',
+                            help='Сохранить результат в JSON-файл.')
+        parser.add_argument('--compare', type=str, default='',
+                            help='JSON-файл предыдущего прогона.')
+        parser.add_argument('--warm', action='store_true',
+                            help='Не очищать кэши перед итерациями.')
+
+    def handle(self, *args, **options):
+        """Основной метод выполнения команды.
+
+        Аргументы:
+            *args: Позиционные аргументы (не используются).
+            **options: Словарь аргументов командной строки.
+        """
+        scenarios = self.get_scenarios(options['limit'])
+        selected = options['scenario'] or list(scenarios)
+        unknown = set(selected) - set(scenarios)
+        if unknown:
+            raise CommandError(
+                f'Неизвестные сценарии: {", ".join(sorted(unknown))}')
+        report = {
+            'commit': self.get_commit(),
+            'database': connection.vendor,
+            'iterations': options['iterations'],
+            'cache': 'warm' if options['warm'] else 'cold',
+            'scenarios': {
+                name: self.run_scenario(*scenarios[name], options)
+                for name in selected},
+        }
+        if options['compare']:
+            self.add_comparison(report, options['compare'])
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output)
+        self.stdout.write(output)
+
+    def get_scenarios(self, limit):
+        """Возвращает сценарии: имя → (клиент, URL).
+
+        Авторизованные запросы выполняются от пользователя с самым
+        большим списком покупок и числом подписок.
+        """
+        user = User.objects.annotate(
+            cart_size=Count('shopping_list', distinct=True),
+            follows=Count('subscriptions', distinct=True)
+        ).order_by('-cart_size', '-follows', 'id').first()
+        recipe = Recipe.objects.order_by('-favorites_count', 'id').first()
+        ingredient = Ingredient.objects.order_by('id').first()
+        if user is None or recipe is None or ingredient is None:
+            raise CommandError(
+                'База пуста, сначала запустите generate_fake_data.')
+        token, _ = Token.objects.get_or_create(user=user)
+        host = next((host for host in settings.ALLOWED_HOSTS
+                     if host and '*' not in host and not host.startswith('.')),
+                    'localhost')
+        anonymous = Client(SERVER_NAME=host)
+        authenticated = Client(SERVER_NAME=host,
+                               HTTP_AUTHORIZATION=f'Token {token.key}')
+        return {
+            'recipes_list_anonymous': (
+                anonymous, f'/api/recipes/?limit={limit}'),
+            'recipes_list_authenticated': (
+                authenticated, f'/api/recipes/?limit={limit}'),
+            'recipe_detail': (authenticated, f'/api/recipes/{recipe.id}/'),
+            'subscriptions': (
+                authenticated, '/api/users/subscriptions/?recipes_limit=3'),
+            'ingredient_search': (
+                authenticated,
+                f'/api/ingredients/?name={ingredient.name[:3]}'),
+            'download_shopping_cart': (
+                authenticated, '/api/recipes/download_shopping_cart/'),
+        }
+
+    def request(self, client, url):
+        """Выполняет запрос и возвращает задержку в мс, запросы и байты."""
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = client.get(url)
+            if response.streaming:
+                size = sum(len(chunk) for chunk in response.streaming_content)
+            else:
+                size = len(response.content)
+            elapsed = (time.perf_counter() - started) * 1000
+        if response.status_code != 200:
+            raise CommandError(f'{url}: статус {response.status_code}')
+        return elapsed, len(queries), size
+
+    @staticmethod
+    def clear_caches():
+        """Очищает кэш API и локальный кэш справочников."""
+        get_cache().clear()
+        catalogue_cache.local.clear()
+
+    def run_scenario(self, client, url, options):
+        """Прогревает эндпоинт и собирает статистику по итерациям."""
+        for _ in range(options['warmup']):
+            self.request(client, url)
+        latencies, query_counts, sizes = [], [], []
+        for _ in range(options['iterations']):
+            if not options['warm']:
+                self.clear_caches()
+            elapsed, queries, size = self.request(client, url)
+            latencies.append(elapsed)
+            query_counts.append(queries)
+            sizes.append(size)
+        result = {
+            'url': url,
+            'mean_ms': round(statistics.mean(latencies), 3),
+            'max_ms': round(max(latencies), 3),
+            'queries': max(query_counts),
+            'queries_per_iteration': query_counts,
+            'bytes': max(sizes),
+        }
+        for share in PERCENTILES:
+            result[f'p{share}_ms'] = round(percentile(latencies, share), 3)
+        return result
+
+    def add_comparison(self, report, path):
+        """Добавляет к сценариям отношение к предыдущему прогону."""
+        with open(path, encoding='utf-8') as file:
+            baseline = json.load(file)
+        report['baseline_commit'] = baseline.get('commit')
+        for name, result in report['scenarios'].items():
+            previous = baseline.get('scenarios', {}).get(name)
+            if not previous:
+                continue
+            for key in ('p50_ms', 'p95_ms'):
+                if previous[key]:
+                    result[f'{key[:-3]}_ratio'] = round(
+                        result[key] / previous[key], 3)
+            result['queries_delta'] = result['queries'] - previous['queries']
+
+    @staticmethod
+    def get_commit():
+        """Возвращает хеш текущего коммита, если доступен git."""
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'],
+                capture_output=True, text=True, check=True,
+                cwd=settings.BASE_DIR).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
@@ -0,0 +1,252 @@
+"""Команда Django для нагрузочного сравнения режимов WSGI и ASGI."""
+
+import json
+import os
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.client import HTTPConnection, HTTPException
+from urllib.parse import quote, urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+
+from rest_framework.authtoken.models import Token
+
+from api.management.commands import benchmark_api
+from recipes.models import Ingredient, Recipe
+from users.models import User
+
+MEMORY_SAMPLE_INTERVAL = 0.5
+
+
+def process_tree_rss(pid):
+    """Возвращает суммарный RSS процесса и его потомков в МБ (Linux)."""
+    total, pending = 0, [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f'/proc/{current}/status', encoding='ascii') as status:
+                for line in status:
+                    if line.startswith('VmRSS:'):
+                        total += int(line.split()[1])
+            for task in os.listdir(f'/proc/{current}/task'):
+                with open(f'/proc/{current}/task/{task}/children',
+                          encoding='ascii') as children:
+                    pending.extend(int(child) for child in
+                                   children.read().split())
+        except (FileNotFoundError, ProcessLookupError):
+            continue
+    return round(total / 1024, 1)
+
+
+class MemorySampler(threading.Thread):
+    """Поток, запоминающий пиковый RSS дерева процессов сервера."""
+
+    def __init__(self, pid):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.peak = 0.0
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.is_set():
+            self.peak = max(self.peak, process_tree_rss(self.pid))
+            self.stopped.wait(MEMORY_SAMPLE_INTERVAL)
+
+    def stop(self):
+        """Останавливает замеры и возвращает пиковый RSS в МБ."""
+        self.stopped.set()
+        self.join()
+        return self.peak
+
+
+class Command(BaseCommand):
+    """Класс команды для замера пропускной способности запущенного сервера.
+
+    В отличие от `benchmark_api`, запросы идут по HTTP к серверу,
+    запущенному отдельно, например через `gunicorn` с
+    `SERVER_MODE=wsgi` или `SERVER_MODE=asgi`. Каждый сценарий
+    нагружается `--concurrency` соединениями в течение `--duration`
+    секунд. С `--pid` (PID мастер-процесса gunicorn) в отчёт
+    добавляется пиковый RSS сервера со всеми воркерами, чтобы
+    сравнивать режимы при одинаковом расходе памяти.
+
+    Атрибут:
+        help (str): Описание команды для `manage.py help`.
+    """
+
+    help = 'Замеряет пропускную способность запущенного сервера по HTTP'
+
+    def add_arguments(self, parser):
+        """
+        Добавляет аргументы командной строки.
+
+        Аргументы:
+            parser (ArgumentParser): Объект парсера аргументов.
+        """
+        parser.add_argument('--url', type=str,
+                            default='http://127.0.0.1:8000',
+                            help='Адрес запущенного сервера.')
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument('--duration', type=float, default=10,
+                            help='Длительность сценария в секундах.')
+        parser.add_argument('--warmup', type=float, default=2,
+                            help='Прогрев сценария в секундах.')
+        parser.add_argument('--limit', type=int, default=6,
+                            help='Размер страницы списка рецептов.')
+        parser.add_argument('--scenario', action='append', default=None,
+                            help='Запустить только указанный сценарий.')
+        parser.add_argument('--pid', type=int, default=None,
+                            help='PID мастер-процесса сервера.')
+        parser.add_argument('--label', type=str, default='',
+                            help='Название прогона, например wsgi или asgi.')
+        parser.add_argument('--output', type=str, default='',
+                            help='Сохранить результат в JSON-файл.')
+        parser.add_argument('--compare', type=str, default='',
+                            help='JSON-файл прогона другого режима.')
+
+    def handle(self, *args, **options):
+        """Основной метод выполнения команды.
+
+        Аргументы:
+            *args: Позиционные аргументы (не используются).
+            **options: Словарь аргументов командной строки.
+        """
+        scenarios = self.get_scenarios(options['limit'])
+        selected = options['scenario'] or list(scenarios)
+        unknown = set(selected) - set(scenarios)
+        if unknown:
+            raise CommandError(
+                f'Неизвестные сценарии: {", ".join(sorted(unknown))}')
+        url = urlsplit(options['url'])
+        if url.scheme != 'http' or not url.hostname:
+            raise CommandError('Поддерживается только адрес вида http://host')
+        sampler = None
+        if options['pid']:
+            sampler = MemorySampler(options['pid'])
+            sampler.start()
+        report = {
+            'label': options['label'],
+            'commit': benchmark_api.Command.get_commit(),
+            'url': options['url'],
+            'concurrency': options['concurrency'],
+            'duration': options['duration'],
+            'scenarios': {
+                name: self.run_scenario(url, *scenarios[name], options)
+                for name in selected},
+        }
+        if sampler is not None:
+            report['peak_rss_mb'] = sampler.stop()
+        if options['compare']:
+            self.add_comparison(report, options['compare'])
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output)
+        self.stdout.write(output)
+
+    def get_scenarios(self, limit):
+        """Возвращает сценарии: имя → (заголовки, путь).
+
+        Авторизованные запросы выполняются от пользователя с самым
+        большим списком покупок, как в `benchmark_api`.
+        """
+        user = User.objects.annotate(
+            cart_size=Count('shopping_list', distinct=True),
+            follows=Count('subscriptions', distinct=True)
+        ).order_by('-cart_size', '-follows', 'id').first()
+        recipe = Recipe.objects.order_by('-favorites_count', 'id').first()
+        ingredient = Ingredient.objects.order_by('id').first()
+        if user is None or recipe is None or ingredient is None:
+            raise CommandError(
+                'База пуста, сначала запустите generate_fake_data.')
+        token, _ = Token.objects.get_or_create(user=user)
+        anonymous = {'Accept': 'application/json'}
+        authenticated = {**anonymous,
+                         'Authorization': f'Token {token.key}'}
+        return {
+            'recipes_list_anonymous': (
+                anonymous, f'/api/recipes/?limit={limit}'),
+            'recipes_list_authenticated': (
+                authenticated, f'/api/recipes/?limit={limit}'),
+            'recipe_detail': (authenticated, f'/api/recipes/{recipe.id}/'),
+            'ingredient_search': (
+                anonymous,
+                f'/api/ingredients/?name={quote(ingredient.name[:3])}'),
+            'tags': (anonymous, '/api/tags/'),
+        }
+
+    @staticmethod
+    def worker(url, headers, path, deadline):
+        """Шлёт запросы по одному соединению до `deadline`.
+
+        Возвращает задержки успешных запросов в мс и число ошибок.
+        """
+        connection = HTTPConnection(url.hostname, url.port or 80, timeout=30)
+        latencies, errors = [], 0
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                connection.request('GET', path, headers=headers)
+                response = connection.getresponse()
+                response.read()
+            except (OSError, HTTPException):
+                connection.close()
+                errors += 1
+                continue
+            if response.status == 200:
+                latencies.append((time.perf_counter() - started) * 1000)
+            else:
+                errors += 1
+        connection.close()
+        return latencies, errors
+
+    def load(self, url, headers, path, concurrency, duration):
+        """Нагружает путь `concurrency` соединениями `duration` секунд."""
+        deadline = time.perf_counter() + duration
+        with ThreadPoolExecutor(concurrency) as executor:
+            results = list(executor.map(
+                lambda _: self.worker(url, headers, path, deadline),
+                range(concurrency)))
+        latencies = [value for values, _ in results for value in values]
+        return latencies, sum(errors for _, errors in results)
+
+    def run_scenario(self, url, headers, path, options):
+        """Прогревает сервер и собирает статистику сценария."""
+        concurrency = options['concurrency']
+        self.load(url, headers, path, concurrency, options['warmup'])
+        latencies, errors = self.load(
+            url, headers, path, concurrency, options['duration'])
+        if not latencies:
+            raise CommandError(f'{path}: нет успешных ответов')
+        result = {
+            'url': path,
+            'requests': len(latencies),
+            'errors': errors,
+            'rps': round(len(latencies) / options['duration'], 1),
+            'mean_ms': round(statistics.mean(latencies), 3),
+        }
+        for share in benchmark_api.PERCENTILES:
+            result[f'p{share}_ms'] = round(
+                benchmark_api.percentile(latencies, share), 3)
+        return result
+
+    @staticmethod
+    def add_comparison(report, path):
+        """Добавляет к сценариям отношение к прогону другого режима."""
+        with open(path, encoding='utf-8') as file:
+            baseline = json.load(file)
+        report['baseline_label'] = baseline.get('label')
+        for name, result in report['scenarios'].items():
+            previous = baseline.get('scenarios', {}).get(name)
+            if not previous:
+                continue
+            for key in ('rps', 'p50_ms', 'p95_ms'):
+                if previous[key]:
+                    result[f'{key}_ratio'] = round(
+                        result[key] / previous[key], 3)
+        if report.get('peak_rss_mb') and baseline.get('peak_rss_mb'):
+            report['peak_rss_ratio'] = round(
+                report['peak_rss_mb'] / baseline['peak_rss_mb'], 3)
@@ -0,0 +1,151 @@
+"""Команда Django для вывода планов горячих SQL-запросов API."""
+
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count, Q
+
+from recipes.models import FavoriteRecipe, Recipe, ShoppingList, Subscription
+from recipes.shopping_list import query_totals
+from recipes.timeline import get_feed
+from users.models import User
+
+# Полный просмотр таблицы без индекса в плане запроса.
+FULL_SCAN_PATTERNS = {
+    'sqlite': re.compile(r'\bSCAN (\w+)(?! USING)(?!\w)'),
+    'postgresql': re.compile(r'\bSeq Scan on (\w+)'),
+}
+
+
+def explain(queryset):
+    """Возвращает план запроса в текстовом виде.
+
+    `QuerySet.explain()` не работает с фильтром по оконной функции
+    (Django вставляет EXPLAIN во внутренний подзапрос), поэтому
+    префикс EXPLAIN добавляется к готовому SQL.
+    """
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'{connection.ops.explain_query_prefix()} {sql}', params)
+        return '\n'.join(
+            ' '.join(str(value) for value in row)
+            for row in cursor.fetchall())
+
+
+class Command(BaseCommand):
+    """Класс команды для проверки планов запросов через EXPLAIN.
+
+    Строит планы запросов ленты рецептов, подписок, избранного,
+    списка покупок и состояния пользователя на текущей базе.
+    С `--check` завершается ошибкой, если какой-либо запрос
+    просматривает таблицу целиком. На маленькой базе PostgreSQL
+    может выбрать полный просмотр и при наличии индекса, поэтому
+    проверку стоит запускать на данных `generate_fake_data`.
+
+    Атрибут:
+        help (str): Описание команды для `manage.py help`.
+    """
+
+    help = 'Выводит планы горячих SQL-запросов и ищет полные просмотры'
+
+    def add_arguments(self, parser):
+        """
+        Добавляет аргументы командной строки.
+
+        Аргументы:
+            parser (ArgumentParser): Объект парсера аргументов.
+        """
+        parser.add_argument('--output', type=str, default='',
+                            help='Сохранить отчёт в Markdown-файл.')
+        parser.add_argument('--check', action='store_true',
+                            help='Ошибка, если есть полный просмотр таблицы.')
+
+    def handle(self, *args, **options):
+        """Основной метод выполнения команды.
+
+        Аргументы:
+            *args: Позиционные аргументы (не используются).
+            **options: Словарь аргументов командной строки.
+        """
+        pattern = FULL_SCAN_PATTERNS.get(connection.vendor)
+        version = '.'.join(
+            str(part) for part in connection.get_database_version())
+        lines = [f'# Планы горячих запросов ({connection.vendor})', '',
+                 'Отчёт построен командой '
+                 '`python manage.py explain_queries` на '
+                 f'{connection.display_name} {version}: '
+                 f'{Recipe.objects.count()} рецептов, '
+                 f'{User.objects.count()} пользователей.', '']
+        full_scans = []
+        tables = set(connection.introspection.table_names())
+        for title, queryset in self.get_queries().items():
+            plan = explain(queryset)
+            scans = pattern.findall(plan) if pattern else []
+            full_scans.extend(
+                f'{title}: {table}' for table in scans if table in tables)
+            lines += [f'## {title}', '', '```', plan, '```', '']
+        report = '\n'.join(lines)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(report)
+        self.stdout.write(report)
+        if options['check'] and full_scans:
+            raise CommandError(
+                'Полный просмотр таблиц: ' + ', '.join(full_scans))
+
+    def get_queries(self):
+        """Возвращает запросы для EXPLAIN: заголовок → QuerySet.
+
+        Запросы строятся для пользователя с самым большим списком
+        покупок и числом подписок и для автора с наибольшим
+        числом рецептов.
+        """
+        user = User.objects.annotate(
+            cart_size=Count('shopping_list', distinct=True),
+            follows=Count('subscriptions', distinct=True)
+        ).order_by('-cart_size', '-follows', 'id').first()
+        author = User.objects.order_by('-recipes_count', 'id').first()
+        recipe = Recipe.objects.order_by('-favorites_count', 'id').first()
+        if user is None or recipe is None:
+            raise CommandError(
+                'База пуста, сначала запустите generate_fake_data.')
+        feed = Recipe.objects.defer('search_vector').select_related('author')
+        last = feed.order_by('-creation_date', '-id')[5]
+        author_ids = list(user.subscriptions.values_list(
+            'author_id', flat=True)[:6]) or [author.id]
+        timeline = get_feed(user).order_by('-feed_date', '-feed_recipe')
+        timeline_last = timeline[5] if timeline[5:6] else timeline.first()
+        return {
+            'Лента рецептов': feed.order_by('-creation_date', '-id')[:6],
+            'Лента рецептов, следующая страница курсора': feed.filter(
+                Q(creation_date__lt=last.creation_date)
+                | Q(creation_date=last.creation_date, id__lt=last.id)
+            ).order_by('-creation_date', '-id')[:6],
+            'Рецепты автора': feed.filter(author=author).order_by(
+                '-creation_date', '-id')[:6],
+            'Последние рецепты авторов подписок':
+                Recipe.objects.latest_by_author(author_ids, 3),
+            'Лента подписок': timeline[:6],
+            'Лента подписок, следующая страница курсора': timeline.filter(
+                Q(feed_date__lt=timeline_last.feed_date)
+                | Q(feed_date=timeline_last.feed_date,
+                    feed_recipe__lt=timeline_last.feed_recipe))[:6],
+            'Страница подписок': Subscription.objects.filter(
+                subscriber=user).select_related('author').order_by('id')[:6],
+            'Проверка подписки': Subscription.objects.filter(
+                subscriber=user, author=author).values('id')[:1],
+            'Проверка избранного': FavoriteRecipe.objects.filter(
+                user=user, recipe=recipe).values('id')[:1],
+            'Проверка списка покупок': ShoppingList.objects.filter(
+                user=user, recipe=recipe).values('id')[:1],
+            'Сводка списка покупок': query_totals(user.id),
+            'Состояние пользователя: избранное': FavoriteRecipe.objects.filter(
+                user=user).values_list('recipe_id', flat=True),
+            'Состояние пользователя: список покупок':
+                ShoppingList.objects.filter(
+                    user=user).values_list('recipe_id', flat=True),
+            'Состояние пользователя: подписки': Subscription.objects.filter(
+                subscriber=user).values_list('author_id', flat=True),
+        }
@@ -0,0 +1,144 @@
+"""Команда Django для отчёта о SQL-запросах эндпоинтов API."""
+
+import json
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+SORT_FIELDS = ('queries', 'total_ms', 'sql_ms', 'python_ms', 'render_ms')
+
+
+def percentile(values, share):
+    """Возвращает перцентиль `share` (от 0 до 1) отсортированного списка."""
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[min(int(len(values) * share), len(values) - 1)]
+
+
+class Command(BaseCommand):
+    """Класс команды для построения отчёта по файлу `QUERY_STATS_FILE`.
+
+    Группирует записи `QueryBudgetMiddleware` по эндпоинту и методу,
+    ранжирует эндпоинты по среднему количеству запросов или времени
+    и показывает самые частые повторяющиеся SQL-запросы.
+
+    Атрибут:
+        help (str): Описание команды для `manage.py help`.
+    """
+
+    help = 'Выводит рейтинг эндпоинтов API по SQL-запросам и времени'
+
+    def add_arguments(self, parser):
+        """
+        Добавляет аргументы командной строки.
+
+        Аргументы:
+            parser (ArgumentParser): Объект парсера аргументов.
+        """
+        parser.add_argument(
+            '--path',
+            type=str,
+            default=getattr(settings, 'QUERY_STATS_FILE', ''),
+            help='Файл статистики в формате JSONL.'
+        )
+        parser.add_argument(
+            '--sort',
+            choices=SORT_FIELDS,
+            default='queries',
+            help='Поле для сортировки эндпоинтов (по среднему значению).'
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=20,
+            help='Количество эндпоинтов в отчёте.'
+        )
+        parser.add_argument(
+            '--duplicates',
+            type=int,
+            default=3,
+            help='Количество повторяющихся запросов на эндпоинт.'
+        )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            help='Вывести отчёт в формате JSON.'
+        )
+
+    def handle(self, *args, **options):
+        """Основной метод выполнения команды.
+
+        Аргументы:
+            *args: Позиционные аргументы (не используются).
+            **options: Словарь аргументов командной строки.
+        """
+        if not options['path']:
+            raise CommandError(
+                'Укажите --path или настройку QUERY_STATS_FILE.')
+        try:
+            report = self.build_report(options['path'], options)
+        except FileNotFoundError:
+            raise CommandError(f'Файл не найден: {options["path"]}')
+        if options['json']:
+            self.stdout.write(json.dumps(report, ensure_ascii=False,
+                                         indent=2))
+            return
+        for row in report:
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{row["method"]} {row["endpoint"]}'))
+            self.stdout.write(
+                f'  запросов: {row["requests"]}, SQL: ср. '
+                f'{row["avg_queries"]:.1f}, p95 {row["p95_queries"]}, '
+                f'макс. {row["max_queries"]}, сверх бюджета '
+                f'{row["over_budget"]}')
+            self.stdout.write(
+                f'  время, мс: всего ср. {row["avg_total_ms"]:.1f} '
+                f'(p95 {row["p95_total_ms"]:.1f}), SQL '
+                f'{row["avg_sql_ms"]:.1f}, Python {row["avg_python_ms"]:.1f}, '
+                f'рендеринг {row["avg_render_ms"]:.1f}; '
+                f'размер ср. {row["avg_size"]:.0f} Б')
+            for sql, count in row['duplicates']:
+                self.stdout.write(f'  x{count}: {sql}')
+
+    def build_report(self, path, options):
+        """Собирает агрегированную статистику по эндпоинтам."""
+        budgets = getattr(settings, 'QUERY_BUDGETS', {})
+        default_budget = getattr(settings, 'QUERY_BUDGET_DEFAULT', None)
+        groups = defaultdict(list)
+        with open(path, encoding='utf-8') as stats_file:
+            for line in stats_file:
+                if line.strip():
+                    entry = json.loads(line)
+                    groups[(entry['method'], entry['endpoint'])].append(
+                        entry)
+        report = []
+        for (method, endpoint), entries in groups.items():
+            budget = budgets.get(endpoint, default_budget)
+            duplicates = Counter()
+            for entry in entries:
+                duplicates.update(entry['duplicates'])
+            row = {
+                'method': method,
+                'endpoint': endpoint,
+                'requests': len(entries),
+                'over_budget': sum(
+                    1 for entry in entries
+                    if budget is not None and entry['queries'] > budget),
+                'p95_queries': percentile(
+                    [entry['queries'] for entry in entries], 0.95),
+                'max_queries': max(entry['queries'] for entry in entries),
+                'p95_total_ms': percentile(
+                    [entry['total_ms'] for entry in entries], 0.95),
+                'avg_size': sum(
+                    entry['size'] for entry in entries) / len(entries),
+                'duplicates': duplicates.most_common(options['duplicates']),
+            }
+            for field in SORT_FIELDS:
+                row[f'avg_{field}'] = sum(
+                    entry[field] for entry in entries) / len(entries)
+            report.append(row)
+        report.sort(key=lambda row: row[f'avg_{options["sort"]}'],
+                    reverse=True)
+        return report[:options['limit']]
@@ -0,0 +1,192 @@
+"""Модуль middleware для учёта SQL-запросов эндпоинтов API.
+
+Для каждого запроса к `/api/` считаются количество и время SQL-запросов,
+время работы view без SQL (в основном сериализация), время рендеринга
+и размер ответа. При превышении бюджета запросов пишется предупреждение
+в лог или выбрасывается исключение. Статистика может дописываться
+в JSONL-файл, по которому команда `query_report` строит отчёт.
+
+Под ASGI middleware работает асинхронно и не переводит запрос
+в синхронный режим, иначе асинхронные view чтения теряли бы смысл.
+"""
+
+import json
+import logging
+import re
+import time
+from collections import Counter
+from threading import Lock
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+from asgiref.sync import (iscoroutinefunction, markcoroutinefunction,
+                          sync_to_async)
+
+logger = logging.getLogger('api.query_budget')
+
+IN_LIST_RE = re.compile(r'IN \((?:%s, )*%s\)')
+WHITESPACE_RE = re.compile(r'\s+')
+
+
+class QueryBudgetExceeded(Exception):
+    """Эндпоинт выполнил больше SQL-запросов, чем разрешено бюджетом."""
+
+
+def fingerprint(sql):
+    """Приводит SQL к отпечатку: параметры и списки IN схлопываются."""
+    return IN_LIST_RE.sub('IN (...)', WHITESPACE_RE.sub(' ', sql)).strip()
+
+
+class QueryRecorder:
+    """Обёртка выполнения SQL, собирающая статистику запросов."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+
+def add_recorder(recorder):
+    """Подключает обёртку к соединению с БД текущего потока."""
+    connection.execute_wrappers.append(recorder)
+
+
+def remove_recorder(recorder):
+    """Отключает обёртку от соединения с БД текущего потока."""
+    connection.execute_wrappers.remove(recorder)
+
+
+class QueryBudgetMiddleware:
+    """Middleware учёта SQL-запросов и бюджета на эндпоинт.
+
+    Включается настройкой `QUERY_BUDGET_ENABLED`. Бюджет берётся из
+    `QUERY_BUDGETS` по имени view (например, `api:recipe-list`), а при
+    его отсутствии — из `QUERY_BUDGET_DEFAULT`. При
+    `QUERY_BUDGET_RAISE` превышение бюджета приводит к исключению.
+    """
+
+    sync_capable = True
+    async_capable = True
+    write_lock = Lock()
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'QUERY_BUDGET_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.budgets = getattr(settings, 'QUERY_BUDGETS', {})
+        self.default_budget = getattr(settings, 'QUERY_BUDGET_DEFAULT', None)
+        self.raise_on_exceed = getattr(settings, 'QUERY_BUDGET_RAISE', False)
+        self.stats_file = getattr(settings, 'QUERY_STATS_FILE', '')
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not request.path.startswith('/api/'):
+            return self.get_response(request)
+        recorder = QueryRecorder()
+        request.query_stats = {'recorder': recorder, 'render_ms': 0.0}
+        started = time.perf_counter()
+        with connection.execute_wrapper(recorder):
+            response = self.get_response(request)
+        total_ms = (time.perf_counter() - started) * 1000
+        self.record(request, response, recorder, total_ms)
+        return response
+
+    async def __acall__(self, request):
+        """Асинхронный вариант `__call__`.
+
+        ORM под ASGI выполняет SQL в потоке `sync_to_async` запроса,
+        а соединение с БД у каждого потока своё, поэтому обёртка
+        подключается к соединению этого потока. Запись статистики
+        тоже выполняется в нём, чтобы не блокировать цикл событий.
+        """
+        if not request.path.startswith('/api/'):
+            return await self.get_response(request)
+        recorder = QueryRecorder()
+        request.query_stats = {'recorder': recorder, 'render_ms': 0.0}
+        started = time.perf_counter()
+        await sync_to_async(add_recorder)(recorder)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(remove_recorder)(recorder)
+        total_ms = (time.perf_counter() - started) * 1000
+        await sync_to_async(self.record)(
+            request, response, recorder, total_ms)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        stats = getattr(request, 'query_stats', None)
+        if stats is not None:
+            stats['view_started'] = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        """Засекает время рендеринга ответа DRF."""
+        stats = getattr(request, 'query_stats', None)
+        if stats is None:
+            return response
+        recorder = stats['recorder']
+        stats['view_ms'] = (
+            time.perf_counter() - stats.get('view_started',
+                                            time.perf_counter())) * 1000
+        stats['view_sql_ms'] = recorder.duration * 1000
+        render_started = time.perf_counter()
+
+        def finish_render(rendered):
+            stats['render_ms'] = (time.perf_counter() - render_started) * 1000
+
+        response.add_post_render_callback(finish_render)
+        return response
+
+    def record(self, request, response, recorder, total_ms):
+        """Сохраняет статистику запроса и проверяет бюджет."""
+        match = request.resolver_match
+        endpoint = match.view_name if match else request.path
+        stats = request.query_stats
+        if 'view_ms' in stats:
+            python_ms = stats['view_ms'] - stats['view_sql_ms']
+        else:
+            python_ms = total_ms - recorder.duration * 1000
+        duplicates = {
+            sql: count for sql, count in recorder.fingerprints.items()
+            if count > 1}
+        entry = {
+            'endpoint': endpoint,
+            'method': request.method,
+            'status': response.status_code,
+            'queries': recorder.count,
+            'sql_ms': round(recorder.duration * 1000, 3),
+            'python_ms': round(max(python_ms, 0.0), 3),
+            'render_ms': round(stats['render_ms'], 3),
+            'total_ms': round(total_ms, 3),
+            'size': (0 if response.streaming
+                     else len(response.content)),
+            'duplicates': duplicates,
+        }
+        if self.stats_file:
+            line = json.dumps(entry, ensure_ascii=False) + '\n'
+            with self.write_lock, open(self.stats_file, 'a',
+                                       encoding='utf-8') as stats_file:
+                stats_file.write(line)
+        budget = self.budgets.get(endpoint, self.default_budget)
+        if budget is None or recorder.count <= budget:
+            return
+        message = (
+            f'{request.method} {endpoint}: {recorder.count} SQL-запросов '
+            f'при бюджете {budget}')
+        if self.raise_on_exceed:
+            raise QueryBudgetExceeded(message)
+        logger.warning(message, extra={'query_stats': entry})
@@ -1,7 +1,16 @@
 """Модуль кастомной пагинации для API."""
 
+import base64
+import binascii
+import datetime
+
+from django.core.paginator import InvalidPage, Page
+from django.db.models import Q
+
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 from recipes.constants import DEFAULT_PAGE_SIZE
 
@@ -12,10 +21,126 @@ class CustomPagination(PageNumberPagination):
     Позволяет задавать количество объектов на странице через
     параметр запроса `limit`.
     По умолчанию отображает `DEFAULT_PAGE_SIZE` объектов на страницу.
+
+    Если в запросе есть параметр `cursor` (для первой страницы — пустой),
+    включается постраничный вывод по ключу `keyset_fields` (дата, id):
+    вместо OFFSET строки отбираются условием по ключу последней записи,
+    а подсчёт `COUNT(*)` не выполняется. Ответ в этом режиме содержит
+    только `next` и `results`; сортировка всегда по убыванию ключа.
     """
 
     page_size_query_param = 'limit'
     page_size = DEFAULT_PAGE_SIZE
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Неверный курсор.'
+    keyset_fields = ('creation_date', 'id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Выбирает режим пагинации по наличию параметра `cursor`."""
+        self.keyset = self.cursor_query_param in request.query_params
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+        queryset, page_size = self.get_keyset_queryset(queryset, request)
+        return self.get_keyset_page(
+            list(queryset[:page_size + 1]), page_size)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """Асинхронный вариант `paginate_queryset`.
+
+        Число записей и страница читаются асинхронными методами ORM.
+        """
+        self.keyset = self.cursor_query_param in request.query_params
+        if self.keyset:
+            queryset, page_size = self.get_keyset_queryset(queryset, request)
+            return self.get_keyset_page(
+                [obj async for obj in queryset[:page_size + 1]], page_size)
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        paginator = self.django_paginator_class(queryset, page_size)
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            number = paginator.validate_number(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(
+                page_number=page_number, message=str(exc)))
+        bottom = (number - 1) * page_size
+        objects = [obj async for obj in queryset[bottom:bottom + page_size]]
+        self.page = Page(objects, number, paginator)
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+        self.request = request
+        return objects
+
+    def get_keyset_queryset(self, queryset, request):
+        """Возвращает выборку после ключа из курсора и размер страницы."""
+        self.request = request
+        date_field, id_field = self.keyset_fields
+        queryset = queryset.order_by(f'-{date_field}', f'-{id_field}')
+        position = self.decode_cursor(
+            request.query_params[self.cursor_query_param])
+        if position is not None:
+            creation_date, pk = position
+            queryset = queryset.filter(
+                Q(**{f'{date_field}__lt': creation_date})
+                | Q(**{date_field: creation_date, f'{id_field}__lt': pk}))
+        return queryset, self.get_page_size(request)
+
+    def get_keyset_page(self, page, page_size):
+        """Отрезает лишнюю запись и запоминает ключ следующей страницы."""
+        self.next_position = None
+        if len(page) > page_size:
+            page = page[:page_size]
+            self.next_position = tuple(
+                getattr(page[-1], field) for field in self.keyset_fields)
+        return page
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        return Response({
+            'next': self.get_next_cursor_link(),
+            'results': data
+        })
+
+    def get_next_cursor_link(self):
+        """Возвращает ссылку на следующую страницу в режиме курсора."""
+        if self.next_position is None:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.encode_cursor(self.next_position))
+
+    @staticmethod
+    def encode_cursor(position):
+        """Кодирует ключ последней записи страницы в курсор."""
+        creation_date, pk = position
+        raw = f'{creation_date.isoformat()}:{pk}'
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    def decode_cursor(self, cursor):
+        """Декодирует курсор; пустой курсор означает первую страницу."""
+        if not cursor:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+            creation_date, pk = raw.split(':')
+            return datetime.date.fromisoformat(creation_date), int(pk)
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+
+class FeedPagination(CustomPagination):
+    """Пагинатор ленты подписок.
+
+    Курсор строится по полям `feed_date` и `feed_recipe`, которые
+    добавляет `get_feed`, чтобы страницы ленты читались по индексу
+    записей ленты.
+    """
+
+    keyset_fields = ('feed_date', 'feed_recipe')
 
 
 class UserPagination(PageNumberPagination):
@@ -0,0 +1,80 @@
+"""Модуль рендереров ответов API и выгрузки файлов."""
+
+import json
+
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSON-рендерер на `orjson`, если библиотека установлена.
+
+    Выдаёт те же байты, что и `JSONRenderer` DRF с настройками
+    по умолчанию: компактный вывод в UTF-8 с экранированием
+    U+2028 и U+2029. Даты и прочие типы, которые `orjson` не знает,
+    кодируются так же, как в DRF. При отступах, нестандартных
+    настройках JSON или ошибке кодирования используется `JSONRenderer`.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """Кодирует данные в JSON через `orjson`."""
+        if (orjson is None or data is None or self.ensure_ascii
+                or not self.compact or not self.strict
+                or self.get_indent(accepted_media_type,
+                                   renderer_context or {}) is not None):
+            return super().render(
+                data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(
+                data, default=JSONEncoder().default,
+                option=(orjson.OPT_PASSTHROUGH_DATETIME
+                        | orjson.OPT_NON_STR_KEYS))
+        except TypeError:
+            return super().render(
+                data, accepted_media_type, renderer_context)
+        return ret.replace(
+            '\u2028'.encode(), b'\\u2028').replace(
+                '\u2029'.encode(), b'\\u2029')
+
+
+class FileExportRenderer(BaseRenderer):
+    """Базовый рендерер для выгрузки файлов.
+
+    Сам файл отдаётся через `StreamingHttpResponse` в обход рендеринга,
+    а рендерер нужен для выбора формата по `?format=` и заголовку
+    `Accept`. Через него выводятся только ответы с ошибками.
+    """
+
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """Выводит данные ответа с ошибкой как текст."""
+        if data is None:
+            return b''
+        return json.dumps(data, ensure_ascii=False).encode(self.charset)
+
+
+class PlainTextRenderer(FileExportRenderer):
+    """Рендерер для выгрузки в текстовом формате."""
+
+    media_type = 'text/plain'
+    format = 'txt'
+
+
+class CSVRenderer(FileExportRenderer):
+    """Рендерер для выгрузки в формате CSV."""
+
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class PDFRenderer(FileExportRenderer):
+    """Рендерер для выгрузки в формате PDF."""
+
+    media_type = 'application/pdf'
+    format = 'pdf'
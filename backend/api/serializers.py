@@ -1,29 +1,55 @@
 """Модуль сериализаторов для работы с юзерами, рецептами и подписками."""
 
-import base64
+import binascii
+from collections import Counter
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.core.files.base import ContentFile
+from django.db import transaction
 
 from djoser.serializers import UserCreateSerializer
 from rest_framework import serializers
 
+from recipes.cache import bump_generation_on_commit
+from recipes.constants import BULK_LINKS_LIMIT, RECIPES_LIMIT_DEFAULT
+from recipes.images import SOURCE_KEY, decode_base64_file
 from recipes.models import (FavoriteRecipe, Ingredient, Recipe,
                             RecipeIngredient, ShoppingList, Subscription, Tag)
+from recipes.search import update_search_index
+from recipes.shopping_list import invalidate_all_shopping_lists
+from recipes.user_state import get_user_state
 
 User = get_user_model()
 
 
 class Base64ImageField(serializers.ImageField):
-    """Поле для кодирования изображения в base64."""
+    """Поле для кодирования изображения в base64.
+
+    Изображения больше `IMAGE_MAX_PIXELS` пикселей отклоняются.
+    """
+
+    default_error_messages = {
+        'invalid_base64': 'Некорректное изображение в base64.',
+        'too_large': 'Изображение больше {max_pixels} пикселей.',
+    }
 
     def to_internal_value(self, data):
         """Декодирует изображение из base64 и преобразует его в файл."""
         if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
-            ext = format.split('/')[-1]
-            data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
-        return super().to_internal_value(data)
+            format, _, imgstr = data.partition(';base64,')
+            content_type = format[len('data:'):]
+            ext = content_type.split('/')[-1]
+            try:
+                data = decode_base64_file(
+                    imgstr, 'temp.' + ext, content_type)
+            except binascii.Error:
+                self.fail('invalid_base64')
+        file = super().to_internal_value(data)
+        image = getattr(file, 'image', None)
+        max_pixels = settings.IMAGE_MAX_PIXELS
+        if image is not None and image.width * image.height > max_pixels:
+            self.fail('too_large', max_pixels=max_pixels)
+        return file
 
 
 class CustomUserCreateSerializer(UserCreateSerializer):
@@ -67,6 +93,134 @@ class TagSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'slug', 'color')
 
 
+class ReadOnlySerializer(serializers.BaseSerializer):
+    """Базовый сериализатор только для чтения без описания полей.
+
+    Наследники строят словарь ответа напрямую из объекта или строки
+    `.values()`, не создавая и не обходя поля DRF для каждого элемента.
+    """
+
+    date_field = serializers.DateField()
+
+    def get_file_url(self, file):
+        """Возвращает абсолютный URL файла, как `ImageField` в DRF."""
+        if not file:
+            return None
+        request = self.context.get('request')
+        url = file.url
+        return request.build_absolute_uri(url) if request else url
+
+    def get_derivative_urls(self, file, derivatives):
+        """Возвращает абсолютные URL уменьшенных копий изображения.
+
+        Пока копии не построены, возвращается пустой словарь.
+        """
+        if not file or derivatives.get(SOURCE_KEY) != file.name:
+            return {}
+        request = self.context.get('request')
+        urls = {}
+        for size_name, name in derivatives.items():
+            if size_name == SOURCE_KEY:
+                continue
+            url = file.storage.url(name)
+            urls[size_name] = (
+                request.build_absolute_uri(url) if request else url)
+        return urls
+
+    def get_state(self):
+        """Возвращает кэш состояния текущего пользователя или `None`."""
+        return get_user_state(self.context.get('request'))
+
+
+class IngredientReadSerializer(ReadOnlySerializer):
+    """Сериализатор строк `.values('id', 'name', 'unit')` ингредиентов."""
+
+    def to_representation(self, row):
+        """Строка `.values()` уже имеет форму ответа."""
+        return row
+
+
+class UserReadSerializer(ReadOnlySerializer):
+    """Сериализатор пользователя только для чтения.
+
+    Формирует тот же ответ, что и `UserSerializer`.
+    """
+
+    def to_representation(self, user):
+        """Преобразует пользователя в словарь ответа."""
+        return {
+            'id': user.id,
+            'email': user.email,
+            'username': user.username,
+            'first_name': user.first_name,
+            'last_name': user.last_name,
+            'avatar': self.get_file_url(user.avatar),
+            'avatar_derivatives': self.get_derivative_urls(
+                user.avatar, user.avatar_derivatives),
+            'is_subscribed': self.get_is_subscribed(user),
+        }
+
+    def get_is_subscribed(self, obj):
+        """Проверяет, подписан ли текущий пользователь на `obj`.
+
+        Ответ берётся из флага `is_subscribed`, если он задан,
+        иначе из кэша состояния пользователя без запроса к БД.
+        """
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
+        state = self.get_state()
+        return state is not None and state.contains('following', obj.id)
+
+
+class RecipeReadSerializer(ReadOnlySerializer):
+    """Сериализатор рецепта только для чтения.
+
+    Формирует тот же ответ, что и `RecipeSerializer`, из рецепта
+    с загруженными `with_related()` автором, тегами и ингредиентами.
+    """
+
+    def to_representation(self, recipe):
+        """Преобразует рецепт в словарь ответа."""
+        author = recipe.author
+        return {
+            'id': recipe.id,
+            'name': recipe.name,
+            'text': recipe.text,
+            'cooking_time': recipe.cooking_time,
+            'author': {
+                'id': author.id,
+                'username': author.username,
+                'first_name': author.first_name,
+                'last_name': author.last_name,
+                'avatar': author.avatar.url if author.avatar else None,
+            },
+            'image': self.get_file_url(recipe.image),
+            'image_derivatives': self.get_derivative_urls(
+                recipe.image, recipe.image_derivatives),
+            'slug': recipe.slug,
+            'creation_date': self.date_field.to_representation(
+                recipe.creation_date),
+            'is_favorited': self.get_flag(recipe, 'favorites'),
+            'is_in_shopping_cart': self.get_flag(recipe, 'cart'),
+            'tags': [
+                {'id': tag.id, 'name': tag.name, 'slug': tag.slug,
+                 'color': tag.color}
+                for tag in recipe.tags.all()],
+            'ingredients': [
+                {'id': item.ingredient.id, 'name': item.ingredient.name,
+                 'unit': item.ingredient.unit, 'amount': item.amount}
+                for item in recipe.recipe_ingredients.all()],
+        }
+
+    def get_flag(self, recipe, kind):
+        """Проверяет, есть ли рецепт в избранном или списке покупок.
+
+        Ответ берётся из кэша состояния пользователя без запроса к БД.
+        """
+        state = self.get_state()
+        return state is not None and state.contains(kind, recipe.id)
+
+
 class RecipeIngredientSerializer(serializers.ModelSerializer):
     """Сериализатор связи ингредиента и рецепта."""
 
@@ -87,12 +241,54 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
         }
 
 
+def get_objects_in_bulk(queryset, ids, name):
+    """Загружает объекты по списку id одним запросом `in_bulk`.
+
+    Отсутствующие и повторяющиеся id перечисляются в одной ошибке
+    валидации. Возвращает словарь {id: объект}.
+    """
+    objects = queryset.in_bulk(set(ids))
+    errors = []
+    missing = sorted(set(ids) - objects.keys())
+    if missing:
+        errors.append(
+            f'{name} не найдены: {", ".join(map(str, missing))}.')
+    duplicates = sorted(pk for pk, count in Counter(ids).items() if count > 1)
+    if duplicates:
+        errors.append(
+            f'{name} повторяются: {", ".join(map(str, duplicates))}.')
+    if errors:
+        raise serializers.ValidationError(errors)
+    return objects
+
+
+class BulkPrimaryKeyField(serializers.ListField):
+    """Список id объектов, загружаемых одним запросом.
+
+    В отличие от `PrimaryKeyRelatedField(many=True)`, который ищет
+    каждый объект отдельным запросом, возвращает список объектов
+    в порядке переданных id.
+    """
+
+    child = serializers.IntegerField(min_value=1)
+
+    def __init__(self, queryset, verbose_name, **kwargs):
+        self.queryset = queryset
+        self.verbose_name = verbose_name
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        """Проверяет id и заменяет их объектами."""
+        ids = super().to_internal_value(data)
+        objects = get_objects_in_bulk(
+            self.queryset.all(), ids, self.verbose_name)
+        return [objects[pk] for pk in ids]
+
+
 class RecipeIngredientInputSerializer(serializers.ModelSerializer):
     """Сериализатор для ввода ингредиентов в рецепте."""
 
-    id = serializers.PrimaryKeyRelatedField(
-        queryset=Ingredient.objects.all(),
-        source='ingredient')
+    id = serializers.IntegerField(min_value=1, source='ingredient')
 
     class Meta:
         """Метаданные для настройки сериализатора ввода."""
@@ -116,13 +312,13 @@ class RecipeIngredientOutputSerializer(serializers.ModelSerializer):
 class RecipeSerializer(serializers.ModelSerializer):
     """Сериализатор для рецепта."""
 
-    author = serializers.SerializerMethodField()
+    author = serializers.ReadOnlyField()
     image = Base64ImageField(required=True)
-    is_favorited = serializers.SerializerMethodField()
-    is_in_shopping_cart = serializers.SerializerMethodField()
-    tags = serializers.PrimaryKeyRelatedField(
+    is_favorited = serializers.ReadOnlyField()
+    is_in_shopping_cart = serializers.ReadOnlyField()
+    tags = BulkPrimaryKeyField(
         queryset=Tag.objects.all(),
-        many=True,
+        verbose_name='Теги',
         write_only=True,
         required=False)
     ingredients = RecipeIngredientInputSerializer(
@@ -144,80 +340,86 @@ class RecipeSerializer(serializers.ModelSerializer):
 
     def to_representation(self, instance):
         """Преобразует модель рецепта в словарь для сериализации."""
-        representation = super().to_representation(instance)
-        representation['tags'] = TagSerializer(
-            instance.tags.all(),
-            many=True
-        ).data
-        representation['ingredients'] = [
-            {
-                'id': recipe_ingredient.ingredient.id,
-                'name': recipe_ingredient.ingredient.name,
-                'unit': recipe_ingredient.ingredient.unit,
-                'amount': recipe_ingredient.amount
-            }
-            for recipe_ingredient in instance.recipe_ingredients.all()
-        ]
-        return representation
-
-    def get_author(self, obj):
-        """Получает информацию об авторе рецепта."""
-        author = obj.author
-        return {
-            'id': author.id,
-            'username': author.username,
-            'first_name': author.first_name,
-            'last_name': author.last_name,
-            'avatar': obj.author.avatar.url if obj.author.avatar else None
-        }
-
-    def get_is_favorited(self, obj):
-        """Проверяет, добавлен ли рецепт в избранное текущим пользователем."""
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return FavoriteRecipe.objects.filter(
-                user=request.user,
-                recipe=obj).exists()
-        return False
-
-    def _update_tags_and_ingredients(self, recipe, tags, ingredients_data):
-        """Обновляет теги и ингредиенты рецепта."""
-        recipe.tags.set(tags)
-        recipe.recipe_ingredients.all().delete()
-        ingredients = [
-            RecipeIngredient(
-                recipe=recipe,
-                ingredient=item['ingredient'],
-                amount=item['amount']
-            ) for item in ingredients_data
-        ]
-        RecipeIngredient.objects.bulk_create(ingredients)
+        return RecipeReadSerializer(
+            context=self.context).to_representation(instance)
 
+    def validate_ingredients(self, value):
+        """Заменяет id ингредиентов объектами из одного запроса."""
+        if any('ingredient' not in item or 'amount' not in item
+               for item in value):
+            raise serializers.ValidationError(
+                'У каждого ингредиента должны быть id и amount.')
+        ids = [item['ingredient'] for item in value]
+        objects = get_objects_in_bulk(
+            Ingredient.objects.all(), ids, 'Ингредиенты')
+        for item in value:
+            item['ingredient'] = objects[item['ingredient']]
+        return value
+
+    def _update_ingredients(self, recipe, ingredients_data, created=False):
+        """Приводит ингредиенты рецепта к переданному списку.
+
+        Изменения применяются разницей: меняются количества
+        изменившихся строк, добавляются новые и удаляются лишние.
+        `bulk_update` и `bulk_create` не отправляют сигналы, поэтому
+        кэши рецептов и списков покупок сбрасываются здесь же, а индекс
+        пересчитывается, только если изменился состав ингредиентов.
+        Удаление отправляет `post_delete` для каждой строки, и тогда
+        индекс и кэши обновляют обработчики сигналов.
+        Возвращает `True`, если ингредиенты изменились.
+        """
+        amounts = {item['ingredient'].id: item['amount']
+                   for item in ingredients_data}
+        existing = {} if created else {
+            item.ingredient_id: item
+            for item in recipe.recipe_ingredients.only(
+                'id', 'recipe_id', 'ingredient_id', 'amount')}
+        changed = []
+        for ingredient_id, item in existing.items():
+            amount = amounts.get(ingredient_id)
+            if amount is not None and amount != item.amount:
+                item.amount = amount
+                changed.append(item)
+        added = [
+            RecipeIngredient(recipe=recipe, ingredient=item['ingredient'],
+                             amount=item['amount'])
+            for item in ingredients_data
+            if item['ingredient'].id not in existing]
+        removed = [item.id for ingredient_id, item in existing.items()
+                   if ingredient_id not in amounts]
+        if changed:
+            RecipeIngredient.objects.bulk_update(changed, ['amount'])
+        if added:
+            RecipeIngredient.objects.bulk_create(added)
+        if removed:
+            RecipeIngredient.objects.filter(id__in=removed).delete()
+        elif changed or added:
+            if added:
+                update_search_index([recipe.pk])
+            invalidate_all_shopping_lists()
+            bump_generation_on_commit('recipes')
+        return bool(changed or added or removed)
+
+    @transaction.atomic
     def create(self, validated_data):
         """Создает новый рецепт на основе валидных данных."""
         ingredients_data = validated_data.pop('recipe_ingredients', [])
         tags = validated_data.pop('tags', [])
         recipe = Recipe.objects.create(**validated_data)
-        self._update_tags_and_ingredients(recipe, tags, ingredients_data)
+        recipe.tags.set(tags)
+        self._update_ingredients(recipe, ingredients_data, created=True)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         """Обновляет существующий рецепт на основе валидных данных."""
         ingredients_data = validated_data.pop('recipe_ingredients', [])
         tags = validated_data.pop('tags', [])
         instance = super().update(instance, validated_data)
-        self._update_tags_and_ingredients(instance, tags, ingredients_data)
+        instance.tags.set(tags)
+        self._update_ingredients(instance, ingredients_data)
         return instance
 
-    def get_is_in_shopping_cart(self, obj):
-        """Метод для определения, находится ли рецепт в списке покупок."""
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return ShoppingList.objects.filter(
-                user=request.user,
-                recipe=obj).exists()
-        return False
-
 
 class FavoriteRecipeSerializer(serializers.ModelSerializer):
     """Сериализатор для избранных рецептов."""
@@ -239,11 +441,19 @@ class ShoppingListSerializer(serializers.ModelSerializer):
         fields = ('id', 'user', 'recipe')
 
 
+class BulkRecipesSerializer(serializers.Serializer):
+    """Сериализатор списка id рецептов для массовых операций."""
+
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False, max_length=BULK_LINKS_LIMIT)
+
+
 class UserSerializer(serializers.ModelSerializer):
     """Сериализатор для пользователя."""
 
     avatar = Base64ImageField(required=False, allow_null=True)
-    is_subscribed = serializers.SerializerMethodField()
+    is_subscribed = serializers.ReadOnlyField()
 
     class Meta:
         """Метаданные для настройки сериализатора пользователя."""
@@ -252,17 +462,10 @@ class UserSerializer(serializers.ModelSerializer):
         fields = ('id', 'email', 'username', 'first_name',
                   'last_name', 'avatar', 'is_subscribed')
 
-    def get_is_subscribed(self, obj):
-        """Проверяет, подписан ли пользователь на переданный объект."""
-        request = self.context.get('request', None)
-        if request is None or not hasattr(request, 'user'):
-            return False
-        user = request.user
-        if user.is_authenticated:
-            return Subscription.objects.filter(
-                author=obj,
-                subscriber=user).exists()
-        return False
+    def to_representation(self, instance):
+        """Преобразует пользователя в словарь для сериализации."""
+        return UserReadSerializer(
+            context=self.context).to_representation(instance)
 
 
 class SubscriptionSerializer(serializers.ModelSerializer):
@@ -292,20 +495,42 @@ class SubscriptionSerializer(serializers.ModelSerializer):
                   'recipes_count')
 
     def get_recipes(self, obj):
-        """Возвращает 3 последних рецепта автора."""
-        recipes = obj.author.recipes.order_by('-creation_date')[:3]
-        serializer = RecipeSerializer(recipes, many=True, context=self.context)
+        """Возвращает последние рецепты автора.
+
+        Рецепты берутся из `recipes_by_author` в контексте, заранее
+        загруженного одним запросом на всю страницу подписок.
+        """
+        recipes_by_author = self.context.get('recipes_by_author')
+        if recipes_by_author is not None:
+            recipes = recipes_by_author.get(obj.author_id, [])
+        else:
+            recipes = obj.author.recipes.order_by(
+                '-creation_date', '-id')[:self.get_recipes_limit()]
+        serializer = RecipeReadSerializer(
+            recipes, many=True, context=self.context)
         return serializer.data
 
+    def get_recipes_limit(self):
+        """Возвращает лимит рецептов из параметра `recipes_limit`."""
+        try:
+            limit = int(self.context.get('recipes_limit'))
+        except (TypeError, ValueError):
+            return RECIPES_LIMIT_DEFAULT
+        return limit if limit >= 0 else RECIPES_LIMIT_DEFAULT
+
     def get_recipes_count(self, obj):
-        """Возвращает общее количество рецептов автора."""
-        return obj.author.recipes.count()
+        """Возвращает общее количество рецептов автора из счётчика."""
+        return obj.author.recipes_count
 
     def to_representation(self, instance):
         """Возвращает подробную информацию об авторе подписки в ответе."""
         representation = super().to_representation(instance)
-        representation['author'] = UserSerializer(instance.author,
-                                                  context=self.context).data
+        request = self.context.get('request')
+        if request is not None:
+            instance.author.is_subscribed = (
+                instance.subscriber_id == request.user.id)
+        representation['author'] = UserReadSerializer(
+            context=self.context).to_representation(instance.author)
         return representation
 
     def validate(self, attrs):
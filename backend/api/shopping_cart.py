@@ -0,0 +1,105 @@
+"""Модуль выгрузки списка покупок в файлы TXT, CSV и PDF.
+
+Строки списка читаются из курсора БД по одной. TXT и CSV сразу
+отдаются клиенту через `StreamingHttpResponse`, поэтому весь список
+не собирается в памяти целиком. ReportLab держит страницы PDF
+в памяти до `save()`, поэтому PDF собирается целиком и отдаётся
+обычным ответом.
+"""
+
+import csv
+import os
+from io import BytesIO
+
+from django.conf import settings
+
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+PDF_FONT_NAME = 'ShoppingCartFont'
+PDF_FALLBACK_FONT = 'Helvetica'
+PDF_FONT_SIZE = 12
+PDF_LEADING = 18
+PDF_MARGIN = 50
+CSV_HEADER = ('Ингредиент', 'Единица измерения', 'Количество')
+TITLE = 'Список покупок'
+
+
+def format_row(name, unit, amount):
+    """Форматирует строку списка покупок."""
+    return f'{name} ({unit}) — {amount}'
+
+
+def iter_txt(rows):
+    """Построчно отдаёт список покупок в текстовом формате."""
+    separator = ''
+    for name, unit, amount in rows:
+        yield f'{separator}{format_row(name, unit, amount)}'
+        separator = '\n'
+
+
+class _Echo:
+    """Псевдобуфер, который возвращает записанную строку без хранения."""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(rows):
+    """Построчно отдаёт список покупок в формате CSV."""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(CSV_HEADER)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def get_pdf_font():
+    """Регистрирует шрифт с кириллицей для PDF.
+
+    Путь к TTF-шрифту задаётся настройкой `SHOPPING_CART_PDF_FONT`.
+    Если файл не найден, используется встроенный Helvetica.
+    """
+    if PDF_FONT_NAME in pdfmetrics.getRegisteredFontNames():
+        return PDF_FONT_NAME
+    font_path = getattr(settings, 'SHOPPING_CART_PDF_FONT', None)
+    if not font_path or not os.path.exists(font_path):
+        return PDF_FALLBACK_FONT
+    pdfmetrics.registerFont(TTFont(PDF_FONT_NAME, font_path))
+    return PDF_FONT_NAME
+
+
+def render_pdf(rows):
+    """Возвращает список покупок в формате PDF.
+
+    Страницы рисуются по мере чтения строк из курсора, но документ
+    целиком остаётся в памяти до `save()`: ReportLab не умеет
+    записывать готовые страницы в поток.
+    """
+    buffer = BytesIO()
+    font = get_pdf_font()
+    pdf = canvas.Canvas(buffer, pagesize=A4, pageCompression=1)
+    pdf.setTitle(TITLE)
+    width, height = A4
+    pdf.setFont(font, PDF_FONT_SIZE + 4)
+    pdf.drawString(PDF_MARGIN, height - PDF_MARGIN, TITLE)
+    pdf.setFont(font, PDF_FONT_SIZE)
+    position = height - PDF_MARGIN - 2 * PDF_LEADING
+    for name, unit, amount in rows:
+        if position < PDF_MARGIN:
+            pdf.showPage()
+            pdf.setFont(font, PDF_FONT_SIZE)
+            position = height - PDF_MARGIN
+        pdf.drawString(PDF_MARGIN, position, format_row(name, unit, amount))
+        position -= PDF_LEADING
+    pdf.save()
+    return buffer.getvalue()
+
+
+# Формат → (тип содержимого, функция выгрузки, отдаётся ли потоком).
+EXPORTERS = {
+    'txt': ('text/plain; charset=utf-8', iter_txt, True),
+    'csv': ('text/csv; charset=utf-8', iter_csv, True),
+    'pdf': ('application/pdf', render_pdf, False),
+}
@@ -0,0 +1,448 @@
+"""Тесты API рецептов."""
+
+import asyncio
+import json
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db.models import Count, F
+from django.test import (AsyncClient, AsyncRequestFactory, TestCase,
+                         override_settings)
+
+from asgiref.sync import sync_to_async
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.cache import catalogue_cache
+from api.middleware import QueryBudgetMiddleware
+from api.serializers import RecipeSerializer
+from api.views import RecipeViewSet
+from recipes.cache import get_cache, get_generation
+from recipes.constants import RECIPE_IMAGE_SIZES
+from recipes.counters import find_drift
+from recipes.models import (FavoriteRecipe, Ingredient, Recipe,
+                            RecipeIngredient, ShoppingList, Subscription, Tag,
+                            TimelineEntry)
+from users.models import User
+
+RECIPES_COUNT = 8
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def tearDownModule():
+    shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+
+def save_image(name):
+    """Сохраняет в хранилище небольшое изображение PNG."""
+    buffer = BytesIO()
+    Image.new('RGB', (40, 20), 'orange').save(buffer, 'PNG')
+    return default_storage.save(name, ContentFile(buffer.getvalue()))
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class RecipeAPITestCase(TestCase):
+    """Базовый класс тестов с авторами, рецептами и клиентами API.
+
+    `self.client` авторизован токеном читателя, `self.anonymous`
+    выполняет запросы без токена. Файлы сохраняются во временный
+    `MEDIA_ROOT`.
+    """
+
+    client_class = APIClient
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.image = save_image('recipes/images/recipe.png')
+        cls.authors = [
+            User.objects.create_user(
+                email=f'author{number}@example.com',
+                username=f'author{number}', first_name='Автор',
+                last_name=str(number), password='Pass-word-1')
+            for number in range(2)]
+        cls.user = User.objects.create_user(
+            email='reader@example.com', username='reader',
+            first_name='Читатель', last_name='Тестовый',
+            password='Pass-word-1')
+        cls.tags = [Tag.objects.create(name=f'Тег {number}',
+                                       slug=f'tag-{number}')
+                    for number in range(2)]
+        cls.ingredients = [
+            Ingredient.objects.create(name=f'Ингредиент {number}', unit='г')
+            for number in range(3)]
+        cls.recipes = []
+        for number in range(RECIPES_COUNT):
+            recipe = Recipe.objects.create(
+                name=f'Рецепт {number}', text='Описание',
+                image=cls.image, cooking_time=10,
+                author=cls.authors[number % 2])
+            recipe.tags.set(cls.tags)
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(recipe=recipe, ingredient=ingredient,
+                                 amount=100)
+                for ingredient in cls.ingredients)
+            cls.recipes.append(recipe)
+        FavoriteRecipe.objects.create(user=cls.user, recipe=cls.recipes[0])
+        ShoppingList.objects.create(user=cls.user, recipe=cls.recipes[1])
+        Subscription.objects.create(
+            subscriber=cls.user, author=cls.authors[0])
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        get_cache().clear()
+        catalogue_cache.local.clear()
+        self.anonymous = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token}')
+
+
+class RecipeListQueriesTest(RecipeAPITestCase):
+    """Число запросов списка рецептов не зависит от размера страницы."""
+
+    def assert_list_queries(self, client, expected):
+        for limit in (1, 6):
+            with self.subTest(limit=limit):
+                get_cache().clear()
+                with self.assertNumQueries(expected):
+                    response = client.get(
+                        '/api/recipes/', {'limit': limit})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.json()['results']), limit)
+
+    def test_anonymous_list(self):
+        self.assert_list_queries(self.anonymous, 5)
+
+    def test_authenticated_list(self):
+        self.assert_list_queries(self.client, 9)
+
+
+class ImageDerivativesTest(RecipeAPITestCase):
+    """Копии изображения по умолчанию строятся синхронно после коммита."""
+
+    def test_derivatives_are_built_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe = Recipe.objects.create(
+                name='Рецепт с фото', text='Описание',
+                image=save_image('recipes/images/photo.png'),
+                cooking_time=10, author=self.authors[0])
+            self.assertEqual(recipe.image_derivatives, {})
+        recipe.refresh_from_db()
+        derivatives = recipe.image_derivatives
+        self.assertEqual(set(derivatives), {'source', *RECIPE_IMAGE_SIZES})
+        self.assertEqual(derivatives['source'], recipe.image.name)
+        for size in RECIPE_IMAGE_SIZES:
+            self.assertTrue(default_storage.exists(derivatives[size]))
+
+
+class RecipeIngredientsUpdateTest(RecipeAPITestCase):
+    """Ингредиенты рецепта обновляются разницей с текущими строками."""
+
+    def update(self, amounts):
+        return RecipeSerializer()._update_ingredients(self.recipes[0], [
+            {'ingredient': ingredient, 'amount': amount}
+            for ingredient, amount in zip(self.ingredients, amounts)])
+
+    def test_unchanged(self):
+        with self.assertNumQueries(1):
+            self.assertFalse(self.update([100, 100, 100]))
+
+    def test_amounts_only(self):
+        generation = get_generation('recipes')
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertNumQueries(2):
+                self.assertTrue(self.update([100, 200, 300]))
+        self.assertEqual(
+            list(self.recipes[0].recipe_ingredients.order_by(
+                'ingredient_id').values_list('amount', flat=True)),
+            [100, 200, 300])
+        self.assertNotEqual(get_generation('recipes'), generation)
+
+
+class ShoppingCartDownloadTest(RecipeAPITestCase):
+    """TXT и CSV отдаются потоком, PDF собирается целиком."""
+
+    def download(self, export_format):
+        return self.client.get('/api/recipes/download_shopping_cart/',
+                               {'format': export_format})
+
+    def test_text_formats_are_streamed(self):
+        lines = {'txt': 'Ингредиент 0 (г) — 100', 'csv': 'Ингредиент 0,г,100'}
+        for export_format, line in lines.items():
+            with self.subTest(format=export_format):
+                response = self.download(export_format)
+                self.assertTrue(response.streaming)
+                self.assertIn(
+                    line, b''.join(response.streaming_content).decode())
+
+    def test_pdf_is_buffered(self):
+        response = self.download('pdf')
+        self.assertFalse(response.streaming)
+        self.assertTrue(response.content.startswith(b'%PDF'))
+
+
+class CatalogueCacheTest(RecipeAPITestCase):
+    """Кэш справочника сбрасывается только после коммита изменений."""
+
+    def test_tag_change_bumps_generation_on_commit(self):
+        response = self.anonymous.get('/api/tags/')
+        self.assertEqual(len(response.json()), len(self.tags))
+        generation = get_generation('tags')
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.objects.create(name='Новый тег', slug='new-tag')
+            self.assertEqual(get_generation('tags'), generation)
+        self.assertNotEqual(get_generation('tags'), generation)
+        response = self.anonymous.get('/api/tags/')
+        self.assertEqual(len(response.json()), len(self.tags) + 1)
+
+
+class RecipeCacheTest(RecipeAPITestCase):
+    """Кэш рецептов сбрасывается при изменении имени автора."""
+
+    def get_author_names(self):
+        return {recipe['author']['last_name'] for recipe in
+                self.anonymous.get('/api/recipes/').json()['results']}
+
+    def test_author_patch_invalidates_recipes(self):
+        self.assertEqual(self.get_author_names(), {'0', '1'})
+        author = APIClient()
+        author.credentials(HTTP_AUTHORIZATION='Token {}'.format(
+            Token.objects.create(user=self.authors[0])))
+        with self.captureOnCommitCallbacks(execute=True):
+            response = author.put(
+                '/api/users/me/avatar/', {'last_name': 'Новый'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get_author_names(), {'Новый', '1'})
+
+    def test_other_user_changes_keep_recipes(self):
+        generation = get_generation('recipes')
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.create_user(
+                email='new@example.com', username='new', first_name='Новый',
+                last_name='Пользователь', password='Pass-word-1')
+            user = User.objects.get(pk=self.authors[0].pk)
+            user.email = 'changed@example.com'
+            user.save()
+        self.assertEqual(get_generation('recipes'), generation)
+
+
+class ConditionalGetTest(RecipeAPITestCase):
+    """Рецепт отдаётся с ETag и не пересылается без изменений."""
+
+    def test_etag_round_trip(self):
+        url = f'/api/recipes/{self.recipes[0].id}/'
+        response = self.anonymous.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        response = self.anonymous.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe = Recipe.objects.get(pk=self.recipes[0].pk)
+            recipe.name = 'Новое название'
+            recipe.save()
+        response = self.anonymous.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_malformed_id(self):
+        response = self.anonymous.get('/api/recipes/abc/')
+        self.assertEqual(response.status_code, 404)
+
+
+class BulkLinksTest(RecipeAPITestCase):
+    """Массовые операции меняют счётчики только изменённых рецептов."""
+
+    url = '/api/recipes/shopping_cart_bulk/'
+
+    def get_counts(self, recipes):
+        counts = dict(Recipe.objects.filter(
+            id__in=[recipe.id for recipe in recipes]
+        ).values_list('id', 'shopping_cart_count'))
+        return [counts[recipe.id] for recipe in recipes]
+
+    def change(self, method, recipe_ids):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = getattr(self.client, method)(
+                self.url, {'recipes': recipe_ids}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return [item['status'] for item in response.json()['results']]
+
+    def test_add_and_remove(self):
+        recipes = self.recipes[1:4]
+        ids = [recipe.id for recipe in recipes]
+        self.assertEqual(
+            self.change('post', ids + [10 ** 6]),
+            ['already_added', 'added', 'added', 'not_found'])
+        self.assertEqual(self.get_counts(recipes), [1, 1, 1])
+        self.assertEqual(
+            len(self.client.get('/api/recipes/', {'is_in_shopping_cart': 1}
+                                ).json()['results']), 3)
+        self.assertEqual(
+            self.change('delete', ids[:2] + [self.recipes[5].id]),
+            ['removed', 'removed', 'not_added'])
+        self.assertEqual(self.get_counts(recipes), [0, 0, 1])
+        self.assertEqual(ShoppingList.objects.filter(user=self.user).count(),
+                         1)
+
+    def test_counters_match_links(self):
+        ids = [recipe.id for recipe in self.recipes]
+        for method in ('post', 'delete'):
+            self.change(method, ids)
+            self.assertFalse(find_drift(
+                Recipe, 'shopping_cart_count', ShoppingList, 'recipe'
+            ).exists())
+
+
+class FeedTest(RecipeAPITestCase):
+    """Лента подписок читается из записей ленты страницами курсора."""
+
+    def test_cursor_pages_follow_timeline(self):
+        first = self.client.get(
+            '/api/recipes/feed/', {'cursor': '', 'limit': 3}).json()
+        second = self.client.get(first['next']).json()
+        self.assertIsNone(second['next'])
+        self.assertEqual(
+            [recipe['id'] for recipe in first['results'] + second['results']],
+            sorted((recipe.id for recipe in self.recipes
+                    if recipe.author == self.authors[0]), reverse=True))
+
+    def get_feed_ids(self):
+        return [recipe['id'] for recipe in self.client.get(
+            '/api/recipes/feed/', {'limit': 20}).json()['results']]
+
+    @mock.patch('recipes.timeline.TIMELINE_FANOUT_LIMIT', 1)
+    def test_author_crossing_fanout_limit(self):
+        author = self.authors[0]
+        reader = User.objects.create_user(
+            email='second@example.com', username='second',
+            first_name='Второй', last_name='Читатель', password='Pass-word-1')
+        with self.captureOnCommitCallbacks(execute=True):
+            Subscription.objects.create(subscriber=reader, author=author)
+        self.assertFalse(TimelineEntry.objects.filter(author=author).exists())
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe = Recipe.objects.create(
+                name='Новый рецепт', text='Описание', image=self.image,
+                cooking_time=10, author=author)
+        expected = sorted((item.id for item in Recipe.objects.filter(
+            author=author)), reverse=True)
+        self.assertEqual(self.get_feed_ids(), expected)
+        with self.captureOnCommitCallbacks(execute=True):
+            Subscription.objects.filter(
+                subscriber=reader, author=author).delete()
+        self.assertTrue(TimelineEntry.objects.filter(
+            subscriber=self.user, recipe=recipe).exists())
+        self.assertEqual(self.get_feed_ids(), expected)
+
+    def test_new_recipe_fans_out_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe = Recipe.objects.create(
+                name='Новый рецепт', text='Описание',
+                image=self.image, cooking_time=10,
+                author=self.authors[0])
+            self.assertFalse(
+                TimelineEntry.objects.filter(recipe=recipe).exists())
+        self.assertTrue(TimelineEntry.objects.filter(
+            subscriber=self.user, recipe=recipe).exists())
+
+
+class AsyncReadTest(RecipeAPITestCase):
+    """Асинхронные view чтения отвечают так же, как синхронные."""
+
+    async def get_async(self, actions, path, data, headers, **kwargs):
+        with override_settings(ASYNC_READ_VIEWS=True):
+            view = RecipeViewSet.as_view(actions)
+        self.assertTrue(asyncio.iscoroutinefunction(view))
+        response = await view(AsyncRequestFactory().get(
+            path, data, headers=headers), **kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+        return json.loads(response.content)
+
+    async def assert_same(self, actions, path, data=None, **kwargs):
+        token = {'Authorization': f'Token {self.token}'}
+        for client, headers in ((self.anonymous, {}), (self.client, token)):
+            with self.subTest(authenticated=bool(headers)):
+                get_cache().clear()
+                expected = (await sync_to_async(client.get)(
+                    path, data)).json()
+                get_cache().clear()
+                self.assertEqual(await self.get_async(
+                    actions, path, data, headers, **kwargs), expected)
+
+    async def test_list(self):
+        for data in ({'limit': 3, 'page': 2}, {'limit': 3, 'cursor': ''},
+                     {'is_in_shopping_cart': 1}):
+            with self.subTest(**data):
+                await self.assert_same(
+                    {'get': 'list'}, '/api/recipes/', data)
+
+    async def test_retrieve(self):
+        recipe = self.recipes[0]
+        await self.assert_same({'get': 'retrieve'},
+                               f'/api/recipes/{recipe.id}/', pk=recipe.id)
+
+
+class QueryBudgetMiddlewareTest(RecipeAPITestCase):
+    """Учёт запросов одинаков в синхронном и асинхронном стеке."""
+
+    async def test_sync_and_async_stacks(self):
+        stats_file = f'{MEDIA_ROOT}/query_stats.jsonl'
+        headers = {'Authorization': f'Token {self.token}'}
+        with override_settings(QUERY_BUDGET_ENABLED=True,
+                               QUERY_STATS_FILE=stats_file):
+            get_cache().clear()
+            await sync_to_async(self.client_class().get)(
+                '/api/recipes/', headers=headers)
+            get_cache().clear()
+            await AsyncClient().get('/api/recipes/', headers=headers)
+        with open(stats_file, encoding='utf-8') as file:
+            entries = [json.loads(line) for line in file]
+        self.assertEqual(len(entries), 2)
+        self.assertGreater(entries[0]['queries'], 0)
+        self.assertEqual(entries[0]['queries'], entries[1]['queries'])
+
+    async def test_async_stack_stays_async(self):
+        async def get_response(request):
+            return None
+
+        with override_settings(QUERY_BUDGET_ENABLED=True):
+            middleware = QueryBudgetMiddleware(get_response)
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+
+
+class BenchmarkCommandsTest(TestCase):
+    """Генератор данных и бенчмарк API работают на небольшой базе."""
+
+    def test_generate_fake_data_and_benchmark(self):
+        call_command(
+            'generate_fake_data', users=6, recipes=30, ingredients=20,
+            tags=3, favorites=4, cart=3, subscriptions=2, seed=1,
+            stdout=StringIO())
+        self.assertEqual(Recipe.objects.count(), 30)
+        self.assertEqual(User.objects.count(), 6)
+        self.assertFalse(Recipe.objects.annotate(
+            favorites=Count('favorited_by_users')).exclude(
+            favorites_count=F('favorites')).exists())
+        report = self.run_benchmark()
+        self.assertEqual(report['cache'], 'cold')
+        self.assertEqual(len(report['scenarios']), 6)
+        for name, result in report['scenarios'].items():
+            with self.subTest(scenario=name):
+                self.assertGreater(result['bytes'], 0)
+                self.assertEqual(len(result['queries_per_iteration']), 2)
+                self.assertGreater(min(result['queries_per_iteration']), 0)
+        result = self.run_benchmark(
+            warm=True, scenario=['recipes_list_anonymous'])
+        self.assertEqual(result['scenarios']['recipes_list_anonymous'][
+            'queries_per_iteration'][-1], 0)
+
+    def run_benchmark(self, **options):
+        output = StringIO()
+        call_command('benchmark_api', iterations=2, warmup=0, stdout=output,
+                     **options)
+        return json.loads(output.getvalue())
@@ -2,33 +2,45 @@
 
 from http import HTTPStatus
 
-from django.db.models import Count, Sum
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, render
 
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import generics, permissions, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.exceptions import MethodNotAllowed
-from rest_framework.filters import OrderingFilter
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 
+from recipes.links import add_links, remove_links
 from recipes.models import (FavoriteRecipe, Ingredient, Recipe, ShoppingList,
                             Subscription, Tag)
+from recipes.shopping_list import get_shopping_list
+from recipes.timeline import get_feed
+from recipes.user_state import get_user_state
 from users.models import User
 
-from .filters import IngredientFilter, RecipeFilter
-from .pagination import CustomPagination, UserPagination
-from .serializers import (CustomUserCreateSerializer, FavoriteRecipeSerializer,
-                          IngredientSerializer, RecipeSerializer,
-                          ShoppingListSerializer, SubscriptionSerializer,
-                          TagSerializer, UserSerializer)
-
-
-class IngredientViewSet(viewsets.ModelViewSet):
+from .async_views import AsyncReadMixin
+from .cache import CatalogueCacheMixin, RecipeCacheMixin
+from .conditional import ConditionalGetMixin
+from .filters import IngredientFilter, RecipeFilter, RecipeOrderingFilter
+from .pagination import CustomPagination, FeedPagination, UserPagination
+from .renderers import CSVRenderer, PDFRenderer, PlainTextRenderer
+from .serializers import (BulkRecipesSerializer, CustomUserCreateSerializer,
+                          FavoriteRecipeSerializer, IngredientReadSerializer,
+                          IngredientSerializer, RecipeReadSerializer,
+                          RecipeSerializer, ShoppingListSerializer,
+                          SubscriptionSerializer, TagSerializer,
+                          UserReadSerializer, UserSerializer)
+from .shopping_cart import EXPORTERS
+
+
+class IngredientViewSet(CatalogueCacheMixin, AsyncReadMixin,
+                        viewsets.ModelViewSet):
     """Вьюсет для работы с ингредиентами."""
 
+    catalogue_namespace = 'ingredients'
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = [permissions.AllowAny]
@@ -40,10 +52,24 @@ class IngredientViewSet(viewsets.ModelViewSet):
         """Запрещаем создание ингредиента."""
         raise MethodNotAllowed('POST')
 
+    def get_serializer_class(self):
+        """Для списка ингредиентов используется сериализатор строк."""
+        if self.action == 'list':
+            return IngredientReadSerializer
+        return super().get_serializer_class()
+
+    def filter_queryset(self, queryset):
+        """Список ингредиентов читается через `.values()` без моделей."""
+        queryset = super().filter_queryset(queryset)
+        if self.action == 'list':
+            return queryset.values('id', 'name', 'unit')
+        return queryset
 
-class TagViewSet(viewsets.ModelViewSet):
+
+class TagViewSet(CatalogueCacheMixin, AsyncReadMixin, viewsets.ModelViewSet):
     """Вьюсет для работы с тегами рецептов."""
 
+    catalogue_namespace = 'tags'
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = [permissions.AllowAny]
@@ -76,15 +102,23 @@ class UserAvatarUpdateView(generics.UpdateAPIView):
         return self.partial_update(request, *args, **kwargs)
 
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     """Вьюсет для работы с пользователями."""
 
+    etag_generations = ('users',)
+    etag_user_state = True
     lookup_field = 'pk'
-    queryset = User.objects.annotate(recipes_count=Count('recipes'))
+    queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [permissions.AllowAny]
     pagination_class = UserPagination
 
+    def get_serializer_class(self):
+        """Для чтения используется сериализатор без полей DRF."""
+        if self.action in ('list', 'retrieve'):
+            return UserReadSerializer
+        return super().get_serializer_class()
+
     def create(self, request, *args, **kwargs):
         """Создание пользователя с хешированным паролем."""
         serializer = CustomUserCreateSerializer(data=request.data)
@@ -104,8 +138,12 @@ class UserViewSet(viewsets.ModelViewSet):
             return Response({
                 'detail': 'Учетные данные не были предоставлены.'},
                 status=status.HTTP_401_UNAUTHORIZED)
-        serializer = self.get_serializer(request.user)
-        return Response(serializer.data)
+        etag = self.make_etag(
+            request, request.user.pk, request.user.updated_at.isoformat())
+        return self.get_conditional_response(
+            lambda request: Response(
+                self.get_serializer(request.user).data),
+            etag, request)
 
     @action(detail=False, methods=['post'])
     def set_password(self, request):
@@ -162,8 +200,9 @@ class UserViewSet(viewsets.ModelViewSet):
     def recipes(self, request, pk=None):
         """Все рецепты пользователя."""
         user = get_object_or_404(User, pk=pk)
-        recipes = Recipe.objects.filter(author=user)
-        serializer = RecipeSerializer(
+        recipes = Recipe.objects.with_related().filter(
+            author=user).order_by('-creation_date', '-id')
+        serializer = RecipeReadSerializer(
             recipes,
             many=True,
             context={'request': request})
@@ -173,46 +212,78 @@ class UserViewSet(viewsets.ModelViewSet):
             methods=['get'],
             permission_classes=[IsAuthenticated])
     def subscriptions(self, request):
-        """Возвращает список подписок для текущего пользователя."""
-        subscriptions = Subscription.objects.filter(subscriber=request.user)
-        serializer = SubscriptionSerializer(
-            subscriptions,
-            many=True,
-            context={'request': request})
+        """Возвращает список подписок для текущего пользователя.
+
+        Рецепты всех авторов страницы загружаются одним оконным
+        запросом, а их количество берётся из счётчика автора.
+        """
+        subscriptions = Subscription.objects.filter(
+            subscriber=request.user
+        ).select_related('author').order_by('id')
         recipes_limit = request.query_params.get('recipes_limit')
         context = self.get_serializer_context()
         context.update({'recipes_limit': recipes_limit})
         page = self.paginate_queryset(subscriptions)
-        if page is not None:
-            serializer = SubscriptionSerializer(
-                page,
-                many=True,
-                context=context)
-            return self.get_paginated_response(serializer.data)
+        if page is None:
+            page = list(subscriptions)
+        context['recipes_by_author'] = self.get_recipes_by_author(
+            page, SubscriptionSerializer(context=context).get_recipes_limit())
         serializer = SubscriptionSerializer(
-            subscriptions,
+            page,
             many=True,
             context=context)
+        if self.paginator is not None:
+            return self.get_paginated_response(serializer.data)
         return Response(serializer.data)
 
-
-class RecipeViewSet(viewsets.ModelViewSet):
+    def get_recipes_by_author(self, subscriptions, limit):
+        """Группирует последние рецепты авторов подписок по автору."""
+        recipes_by_author = {}
+        author_ids = [subscription.author_id for subscription in subscriptions]
+        if not author_ids or not limit:
+            return recipes_by_author
+        recipes = Recipe.objects.with_related().latest_by_author(
+            author_ids, limit)
+        for recipe in recipes:
+            recipes_by_author.setdefault(recipe.author_id, []).append(recipe)
+        return recipes_by_author
+
+
+class RecipeViewSet(RecipeCacheMixin, ConditionalGetMixin, AsyncReadMixin,
+                    viewsets.ModelViewSet):
     """Вьюсет для работы с рецептами."""
 
-    queryset = Recipe.objects.select_related('author').prefetch_related(
-        'tags', 'ingredients')
+    etag_generations = ('recipes',)
+    etag_user_state = True
+    queryset = Recipe.objects.with_related()
     serializer_class = RecipeSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     pagination_class = CustomPagination
-    filter_backends = [DjangoFilterBackend, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, RecipeOrderingFilter]
     filterset_class = RecipeFilter
     ordering_fields = ['creation_date']
     ordering = ['-creation_date', '-id']
 
+    def initial(self, request, *args, **kwargs):
+        """Загружает состояние пользователя до чтения рецептов.
+
+        Сериализатор берёт из него флаги и в асинхронном режиме
+        не должен обращаться к БД сам.
+        """
+        super().initial(request, *args, **kwargs)
+        if self.action in ('list', 'retrieve'):
+            get_user_state(request)
+
     def perform_create(self, serializer):
         """Автоматически устанавливаем текущего пользователя как автора."""
         serializer.save(author=self.request.user)
 
+    def get_serializer_class(self):
+        """Для чтения используется сериализатор без полей DRF."""
+        if self.action in ('list', 'retrieve'):
+            return RecipeReadSerializer
+        return super().get_serializer_class()
+
     def get_serializer_context(self):
         """Передача request в контекст сериализатора."""
         context = super().get_serializer_context()
@@ -220,9 +291,13 @@ class RecipeViewSet(viewsets.ModelViewSet):
         return context
 
     def get_queryset(self):
-        """Фильтруем рецепты по избранному и списку покупок."""
-        queryset = Recipe.objects.all().order_by('-creation_date', '-id')
+        """Фильтруем рецепты по избранному и списку покупок.
+
+        Флаги `is_favorited` и `is_in_shopping_cart` сериализатор берёт
+        из кэша состояния пользователя, а не запросом на каждый рецепт.
+        """
         request = self.request
+        queryset = super().get_queryset().order_by('-creation_date', '-id')
         is_favorited = request.query_params.get('is_favorited')
         if request.user.is_authenticated and is_favorited == '1':
             queryset = queryset.filter(favorited_by_users__user=request.user)
@@ -262,6 +337,27 @@ class RecipeViewSet(viewsets.ModelViewSet):
                 {'error': 'Рецепт не найден в списке покупок'},
                 status=HTTPStatus.BAD_REQUEST)
 
+    @action(detail=False,
+            methods=['get'],
+            permission_classes=[IsAuthenticated],
+            pagination_class=FeedPagination)
+    def feed(self, request):
+        """Лента рецептов авторов, на которых подписан пользователь.
+
+        Рецепты читаются из ленты пользователя, заполненной при
+        публикации, а не соединением подписок и рецептов.
+        """
+        recipes = get_feed(request.user).with_related().order_by(
+            '-feed_date', '-feed_recipe')
+        page = self.paginate_queryset(recipes)
+        serializer = RecipeReadSerializer(
+            recipes if page is None else page,
+            many=True,
+            context=self.get_serializer_context())
+        if page is None:
+            return Response(serializer.data)
+        return self.get_paginated_response(serializer.data)
+
     @action(detail=True, methods=['get'], url_path='get-link')
     def get_link(self, request, pk=None):
         """Получение короткой ссылки на рецепт."""
@@ -304,6 +400,37 @@ class RecipeViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+    @action(detail=False,
+            methods=['post', 'delete'],
+            url_path='favorite_bulk',
+            permission_classes=[IsAuthenticated])
+    def favorite_bulk(self, request):
+        """Добавление или удаление списка рецептов в/из избранного."""
+        return self.change_links_in_bulk(request, FavoriteRecipe)
+
+    @action(detail=False,
+            methods=['post', 'delete'],
+            url_path='shopping_cart_bulk',
+            permission_classes=[IsAuthenticated])
+    def shopping_cart_bulk(self, request):
+        """Добавление или удаление списка рецептов в/из списка покупок."""
+        return self.change_links_in_bulk(request, ShoppingList)
+
+    def change_links_in_bulk(self, request, model):
+        """Применяет массовую операцию к связям `model` пользователя.
+
+        Принимает `{"recipes": [id, ...]}` и возвращает статус каждого
+        id: `added`, `already_added`, `not_found` при добавлении,
+        `removed`, `not_added` при удалении.
+        """
+        serializer = BulkRecipesSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        change = add_links if request.method == 'POST' else remove_links
+        statuses = change(
+            model, request.user.id, serializer.validated_data['recipes'])
+        return Response({'results': [
+            {'id': pk, 'status': result} for pk, result in statuses.items()]})
+
     def create_recipe(request):
         """Создание нового рецепта, доступ к ингредиентам."""
         ingredients = Ingredient.objects.all()
@@ -319,40 +446,42 @@ class RecipeViewSet(viewsets.ModelViewSet):
         ingredients_serializer = IngredientSerializer(ingredients, many=True)
         return Response(ingredients_serializer.data)
 
-    @action(detail=False, methods=['get'], url_path='download_shopping_cart')
+    @action(detail=False,
+            methods=['get'],
+            url_path='download_shopping_cart',
+            permission_classes=[IsAuthenticated],
+            renderer_classes=[PlainTextRenderer, CSVRenderer, PDFRenderer,
+                              JSONRenderer])
     def download_shopping_cart(self, request, *args, **kwargs):
-        """Скачивание списка покупок для текущего пользователя."""
-        shopping_list = ShoppingList.objects.filter(user=request.user)
-        ingredients = self.get_ingredients_from_shopping_list(shopping_list)
-        content = self.generate_shopping_cart_content(ingredients)
-
-        response = HttpResponse(content, content_type='text/plain')
-        response[
-            'Content-Disposition'] = 'attachment; filename="shopping_list.txt"'
+        """Скачивание списка покупок для текущего пользователя.
+
+        Формат выбирается параметром `?format=txt|csv|pdf`
+        (по умолчанию TXT). TXT и CSV отдаются потоком по мере чтения
+        строк из БД. PDF намеренно собирается целиком и отдаётся обычным
+        ответом: ReportLab держит все страницы документа в памяти до
+        `save()` и записывает таблицу ссылок на объекты только в конце,
+        поэтому отдать готовые страницы раньше нельзя.
+        """
+        export_format = request.accepted_renderer.format
+        if export_format not in EXPORTERS:
+            export_format = 'txt'
+        content_type, exporter, streaming = EXPORTERS[export_format]
+        rows = get_shopping_list(request.user.id)
+        response_class = StreamingHttpResponse if streaming else HttpResponse
+        response = response_class(exporter(rows), content_type=content_type)
+        response['Content-Disposition'] = (
+            f'attachment; filename="shopping_list.{export_format}"')
         return response
 
-    def get_ingredients_from_shopping_list(self, shopping_list):
-        """Извлекает ингредиенты из корзины покупок пользователя."""
-        ingredients = (
-            Ingredient.objects
-            .filter(
-                ingredient_recipes__recipe__shopping_lists__user=(
-                    self.request.user)
-            )
-            .annotate(total_amount=Sum('ingredient_recipes__amount'))
-            .values('name', 'unit', 'total_amount')
-        )
-
-        return {
-            f"{ingredient['name']} ({ingredient['unit']})":
-            ingredient['total_amount']
-            for ingredient in ingredients
-        }
-
-    def generate_shopping_cart_content(self, ingredients):
-        """Генерирует контент для скачивания в виде текста."""
-        return '\n'.join(
-            f'{name} — {amount}' for name, amount in ingredients.items())
+    @action(detail=False,
+            methods=['get'],
+            url_path='shopping_cart_preview',
+            permission_classes=[IsAuthenticated])
+    def shopping_cart_preview(self, request, *args, **kwargs):
+        """Сводный список покупок текущего пользователя в JSON."""
+        return Response([
+            {'name': name, 'unit': unit, 'amount': amount}
+            for name, unit, amount in get_shopping_list(request.user.id)])
 
 
 class FavoriteViewSet(viewsets.ModelViewSet):
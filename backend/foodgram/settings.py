@@ -27,6 +27,7 @@ INSTALLED_APPS = [
     'api.apps.ApiConfig']
 
 MIDDLEWARE = [
+    'api.middleware.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -38,6 +39,21 @@ MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware']
 
+QUERY_BUDGET_ENABLED = os.getenv('QUERY_BUDGET_ENABLED', 'False') == 'True'
+QUERY_BUDGET_RAISE = os.getenv('QUERY_BUDGET_RAISE', 'False') == 'True'
+QUERY_BUDGET_DEFAULT = int(os.getenv('QUERY_BUDGET_DEFAULT', 20))
+QUERY_BUDGETS = {
+    'api:recipe-list': 10,
+    'api:recipe-detail': 10,
+    'api:user-subscriptions': 10,
+    'api:ingredient-list': 3,
+    'api:tag-list': 3,
+}
+QUERY_STATS_FILE = os.getenv('QUERY_STATS_FILE', '')
+
+# Асинхронные view чтения; включается в foodgram/asgi.py.
+ASYNC_READ_VIEWS = os.getenv('ASYNC_READ_VIEWS', 'False') == 'True'
+
 ROOT_URLCONF = 'foodgram.urls'
 
 TEMPLATES = [
@@ -69,6 +85,20 @@ DATABASES = {
     }
 }
 
+# Кэш в памяти процесса подходит для одного процесса. Для нескольких
+# воркеров gunicorn нужен общий кэш, например
+# django.core.cache.backends.db.DatabaseCache (manage.py createcachetable).
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'DJANGO_CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('DJANGO_CACHE_LOCATION', 'foodgram'),
+    }
+}
+
+API_CACHE_ALIAS = 'default'
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -110,6 +140,10 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_PAGINATION_CLASS': None,
     'PAGE_SIZE': None,
 
@@ -140,6 +174,13 @@ CORS_ALLOWED_ORIGINS = [
 ]
 CSV_FILES_DIR = os.path.join(BASE_DIR, 'data')
 
+IMAGE_MAX_PIXELS = int(os.getenv('IMAGE_MAX_PIXELS', 24_000_000))
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', 0))
+
+SHOPPING_CART_PDF_FONT = os.getenv(
+    'SHOPPING_CART_PDF_FONT',
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf')
+
 CSRF_TRUSTED_ORIGINS = ['https://foodgram-net.hopto.org']
 
 
@@ -0,0 +1,41 @@
+"""Настройки gunicorn для запуска бэкенда.
+
+Режим выбирается переменной окружения `SERVER_MODE`:
+`wsgi` (по умолчанию) — синхронные воркеры и `foodgram.wsgi`,
+`asgi` — воркеры uvicorn и `foodgram.asgi` с асинхронными view
+чтения. Число воркеров задаёт `GUNICORN_WORKERS`.
+
+Поколения кэшей и состояние пользователей хранятся в кэше Django.
+`LocMemCache` у каждого процесса свой, поэтому несколько воркеров
+с ним не запускаются: изменения, сделанные в одном воркере, не
+доходили бы до остальных.
+"""
+
+import os
+
+SERVER_MODES = {
+    'wsgi': ('foodgram.wsgi:application', 'sync'),
+    'asgi': ('foodgram.asgi:application', 'uvicorn_worker.UvicornWorker'),
+}
+
+server_mode = os.getenv('SERVER_MODE', 'wsgi')
+if server_mode not in SERVER_MODES:
+    raise ValueError(
+        f'SERVER_MODE должен быть одним из: {", ".join(SERVER_MODES)}')
+
+wsgi_app, worker_class = SERVER_MODES[server_mode]
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.getenv('GUNICORN_WORKERS', 1))
+
+
+def on_starting(server):
+    """Останавливает запуск нескольких воркеров с кэшем в памяти процесса."""
+    if server.cfg.workers < 2:
+        return
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+    from django.conf import settings
+    backend = settings.CACHES[settings.API_CACHE_ALIAS]['BACKEND']
+    if backend.endswith('.LocMemCache'):
+        raise RuntimeError(
+            'Для нескольких воркеров нужен общий кэш: задайте '
+            'DJANGO_CACHE_BACKEND, например DatabaseCache.')
@@ -36,7 +36,8 @@ class IngredientAdmin(admin.ModelAdmin):
 class RecipeAdmin(admin.ModelAdmin):
     """Административный интерфейс для модели Recipe."""
 
-    list_display = ('name', 'author', 'cooking_time', 'creation_date')
+    list_display = ('name', 'author', 'cooking_time', 'creation_date',
+                    'favorites_count')
     search_fields = ('name', 'author__username')
     list_filter = ('tags__name', 'author__username')
     autocomplete_fields = ('tags', 'ingredients')
@@ -7,3 +7,7 @@ class RecipesConfig(AppConfig):
 
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'recipes'
+
+    def ready(self):
+        """Подключает обработчики сигналов приложения."""
+        from recipes import signals  # noqa: F401
@@ -0,0 +1,56 @@
+"""Модуль счётчиков поколений для инвалидации кэшей.
+
+Поколение — число, хранящееся в общем кэше Django под ключом
+пространства имён. Кэши вкладывают поколение в свои ключи, поэтому
+для инвалидации достаточно увеличить счётчик: старые записи больше
+не запрашиваются и вытесняются сами.
+"""
+
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+GENERATION_KEY = 'generation:{}'
+
+
+def get_cache():
+    """Возвращает общий кэш, заданный настройкой `API_CACHE_ALIAS`."""
+    return caches[getattr(settings, 'API_CACHE_ALIAS', 'default')]
+
+
+def get_generation(namespace):
+    """Возвращает текущее поколение пространства имён.
+
+    Начальное значение берётся из текущего времени, чтобы после
+    вытеснения ключа из кэша поколение не совпало с прежним.
+    """
+    cache = get_cache()
+    key = GENERATION_KEY.format(namespace)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        generation = cache.get(key)
+    return generation
+
+
+def bump_generation(namespace):
+    """Увеличивает поколение, делая недействительными старые записи."""
+    cache = get_cache()
+    key = GENERATION_KEY.format(namespace)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        generation = time.time_ns()
+        cache.set(key, generation, timeout=None)
+        return generation
+
+
+def bump_generation_on_commit(namespace):
+    """Увеличивает поколение после коммита текущей транзакции.
+
+    Иначе запрос, пришедший до коммита, закэшировал бы старые данные
+    под новым поколением.
+    """
+    transaction.on_commit(lambda: bump_generation(namespace))
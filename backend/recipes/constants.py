@@ -7,3 +7,27 @@ MAX_LENGHT_NAME = 100
 MAX_LENGHT_UNIT = 50
 MAX_LENGHT_NAME_TAG = 35
 MAX_LENGHT_NAME_TEXT = 250
+RECIPES_LIMIT_DEFAULT = 3
+SHOPPING_CART_CHUNK_SIZE = 500
+INGREDIENT_AUTOCOMPLETE_LIMIT = 50
+CATALOGUE_CACHE_SIZE = 128
+CATALOGUE_CACHE_TIMEOUT = 60 * 60 * 24
+INGREDIENTS_LOAD_BATCH_SIZE = 1000
+SLUG_MAX_ATTEMPTS = 3
+SLUG_SUFFIX_RESERVE = 7
+FAKE_DATA_BATCH_SIZE = 2000
+RECIPE_SEARCH_CONFIG = 'russian'
+IMAGE_DECODE_CHUNK_SIZE = 64 * 1024
+IMAGE_WEBP_QUALITY = 80
+RECIPE_IMAGE_SIZES = {'card': (600, 600), 'detail': (1200, 1200)}
+AVATAR_IMAGE_SIZES = {'avatar': (200, 200)}
+USER_STATE_CACHE_TIMEOUT = 60 * 60
+SHOPPING_LIST_CACHE_TIMEOUT = 60 * 60
+SHOPPING_LIST_CACHE_MAX_ROWS = 500
+# Единица → (базовая единица, множитель) для объединения количеств.
+UNIT_CONVERSIONS = {'кг': ('г', 1000), 'л': ('мл', 1000)}
+TIMELINE_LENGTH = 300
+TIMELINE_TRIM_SLACK = 50
+TIMELINE_FANOUT_LIMIT = 5000
+TIMELINE_BATCH_SIZE = 1000
+BULK_LINKS_LIMIT = 100
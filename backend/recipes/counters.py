@@ -0,0 +1,57 @@
+"""Модуль денормализованных счётчиков.
+
+Счётчики хранятся в колонках моделей и изменяются атомарно выражениями
+`F()` в обработчиках сигналов создания и удаления записей. Команда
+`recount_counters` пересчитывает их по фактическим данным.
+"""
+
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from recipes.models import FavoriteRecipe, Recipe, ShoppingList, Subscription
+from users.models import User
+
+COUNTERS = (
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'subscribers_count', Subscription, 'author'),
+    (Recipe, 'favorites_count', FavoriteRecipe, 'recipe'),
+    (Recipe, 'shopping_cart_count', ShoppingList, 'recipe'),
+)
+
+
+def change_counter(model, pk, field, delta):
+    """Атомарно изменяет счётчик `field` записи `pk` на `delta`."""
+    model.objects.filter(pk=pk).update(
+        **{field: Greatest(F(field) + delta, 0)})
+
+
+def change_counters(model, pks, field, delta):
+    """Атомарно изменяет счётчик `field` записей `pks` одним UPDATE."""
+    model.objects.filter(pk__in=pks).update(
+        **{field: Greatest(F(field) + delta, 0)})
+
+
+def actual_count(related_model, related_field):
+    """Подзапрос с фактическим количеством связанных записей."""
+    return Coalesce(Subquery(
+        related_model.objects.filter(
+            **{related_field: OuterRef('pk')}
+        ).order_by().values(related_field).annotate(
+            total=Count('pk')).values('total')), 0)
+
+
+def find_drift(model, field, related_model, related_field):
+    """Возвращает записи, у которых счётчик расходится с данными."""
+    return model.objects.annotate(
+        actual=actual_count(related_model, related_field)
+    ).exclude(**{field: F('actual')})
+
+
+def recount(model, field, related_model, related_field):
+    """Пересчитывает счётчик одним UPDATE, возвращает число исправленных."""
+    drift = find_drift(model, field, related_model, related_field)
+    ids = list(drift.values_list('pk', flat=True))
+    if ids:
+        model.objects.filter(pk__in=ids).update(
+            **{field: actual_count(related_model, related_field)})
+    return len(ids)
@@ -0,0 +1,212 @@
+"""Модуль обработки загружаемых изображений.
+
+Изображение из base64 декодируется частями во временный файл, не
+создавая в памяти полной копии больших загрузок. После сохранения
+рецепта или пользователя уменьшенные копии в формате WebP (карточка
+и страница рецепта, аватар) строятся после коммита, а их имена
+в хранилище записываются в поля `image_derivatives` и
+`avatar_derivatives`. По умолчанию копии строятся синхронно; пул
+фоновых потоков включается настройкой `IMAGE_WORKERS`.
+"""
+
+import binascii
+import logging
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from threading import Lock
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import (InMemoryUploadedFile,
+                                            TemporaryUploadedFile)
+from django.db import connection, transaction
+
+from PIL import Image, ImageOps
+
+from recipes.cache import bump_generation
+from recipes.constants import IMAGE_DECODE_CHUNK_SIZE, IMAGE_WEBP_QUALITY
+
+logger = logging.getLogger('recipes.images')
+
+DERIVATIVES_DIR = 'derivatives'
+WHITESPACE_RE = re.compile(r'\s')
+SOURCE_KEY = 'source'
+
+_executor = None
+_executor_lock = Lock()
+
+
+class DecodedTemporaryFile(TemporaryUploadedFile):
+    """Временный файл декодированной загрузки.
+
+    Файловое хранилище перемещает временный файл при сохранении.
+    Загрузки из тела запроса Django закрывает сам, а этот файл
+    закрывается при удалении объекта, чтобы не было ошибки об уже
+    перемещённом файле.
+    """
+
+    def __del__(self):
+        self.close()
+
+
+def decode_base64_file(payload, name, content_type):
+    """Декодирует base64 в загружаемый файл по частям.
+
+    Как и обработчики загрузки Django, небольшие файлы держит в памяти,
+    а файлы больше `FILE_UPLOAD_MAX_MEMORY_SIZE` пишет во временный
+    файл на диске. При некорректном base64 выбрасывает `binascii.Error`.
+    """
+    if WHITESPACE_RE.search(payload):
+        payload = ''.join(payload.split())
+    size = len(payload) * 3 // 4
+    if size > settings.FILE_UPLOAD_MAX_MEMORY_SIZE:
+        file = DecodedTemporaryFile(name, content_type, size, None)
+    else:
+        file = InMemoryUploadedFile(
+            BytesIO(), None, name, content_type, size, None)
+    written = 0
+    for start in range(0, len(payload), IMAGE_DECODE_CHUNK_SIZE):
+        chunk = binascii.a2b_base64(
+            payload[start:start + IMAGE_DECODE_CHUNK_SIZE])
+        file.write(chunk)
+        written += len(chunk)
+    file.size = written
+    file.seek(0)
+    return file
+
+
+def build_derivatives(file, sizes):
+    """Строит WebP-копии изображения и сохраняет их в хранилище.
+
+    Возвращает словарь {размер: имя файла} и имя исходного файла
+    под ключом `source`.
+    """
+    storage = file.storage
+    root, _ = os.path.splitext(file.name)
+    directory, filename = os.path.split(root)
+    derivatives = {SOURCE_KEY: file.name}
+    with storage.open(file.name) as original, Image.open(original) as image:
+        image = ImageOps.exif_transpose(image)
+        has_alpha = 'A' in image.getbands() or 'transparency' in image.info
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+        for size_name, box in sizes.items():
+            copy = image.copy()
+            copy.thumbnail(box, Image.Resampling.LANCZOS)
+            buffer = BytesIO()
+            copy.save(buffer, 'WEBP', quality=IMAGE_WEBP_QUALITY)
+            derivatives[size_name] = storage.save(
+                os.path.join(directory, DERIVATIVES_DIR,
+                             f'{filename}_{size_name}.webp'),
+                ContentFile(buffer.getvalue()))
+    return derivatives
+
+
+def delete_derivatives(storage, derivatives, keep=()):
+    """Удаляет файлы копий, кроме перечисленных в `keep`."""
+    for key, name in derivatives.items():
+        if key != SOURCE_KEY and name not in keep:
+            storage.delete(name)
+
+
+def process_image(model, pk, field_name, derivatives_field, sizes,
+                  generation=None):
+    """Строит копии изображения объекта и записывает их имена в модель.
+
+    Если за время обработки изображение заменили, построенные копии
+    удаляются: их построит задача, запущенная для нового файла.
+    После записи копий увеличивается поколение кэша `generation`.
+    """
+    instance = model.objects.filter(pk=pk).only(
+        field_name, derivatives_field).first()
+    if instance is None:
+        return
+    file = getattr(instance, field_name)
+    if not file:
+        return
+    previous = getattr(instance, derivatives_field)
+    derivatives = build_derivatives(file, sizes)
+    updated = model.objects.filter(
+        pk=pk, **{field_name: file.name}
+    ).update(**{derivatives_field: derivatives})
+    if updated:
+        if generation:
+            bump_generation(generation)
+        delete_derivatives(file.storage, previous,
+                           keep=derivatives.values())
+    else:
+        delete_derivatives(file.storage, derivatives)
+
+
+def run_logged(*args):
+    """Выполняет `process_image`, записывая ошибки в журнал.
+
+    Копии строятся после коммита, поэтому ошибка обработки не должна
+    превращать уже сохранённый запрос в ошибку сервера.
+    """
+    try:
+        process_image(*args)
+    except Exception:
+        logger.exception('Не удалось обработать изображение %s', args[:3])
+
+
+def run_in_worker(*args):
+    """Выполняет `process_image` в фоновом потоке."""
+    try:
+        run_logged(*args)
+    finally:
+        connection.close()
+
+
+def get_executor():
+    """Возвращает пул потоков обработки или `None`, если он отключён.
+
+    Размер пула задаётся настройкой `IMAGE_WORKERS`; при нуле
+    изображения обрабатываются синхронно.
+    """
+    global _executor
+    workers = getattr(settings, 'IMAGE_WORKERS', 0)
+    if not workers:
+        return None
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix='images')
+    return _executor
+
+
+def schedule_derivatives(instance, field_name, derivatives_field, sizes,
+                         update_fields=None, generation=None):
+    """Ставит построение копий в очередь после коммита транзакции.
+
+    Копии строятся, только если изображение изменилось с момента
+    прошлой обработки. Если изображение удалено, старые копии
+    удаляются вместе с записью о них.
+    """
+    if update_fields is not None and field_name not in update_fields:
+        return
+    file = getattr(instance, field_name)
+    derivatives = getattr(instance, derivatives_field) or {}
+    model = type(instance)
+    if not file:
+        if derivatives:
+            model.objects.filter(pk=instance.pk).update(
+                **{derivatives_field: {}})
+            setattr(instance, derivatives_field, {})
+            transaction.on_commit(
+                lambda: delete_derivatives(file.storage, derivatives))
+        return
+    if derivatives.get(SOURCE_KEY) == file.name:
+        return
+    args = (model, instance.pk, field_name, derivatives_field, sizes,
+            generation)
+
+    def submit():
+        executor = get_executor()
+        if executor is None:
+            run_logged(*args)
+        else:
+            executor.submit(run_in_worker, *args)
+
+    transaction.on_commit(submit)
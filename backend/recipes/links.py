@@ -0,0 +1,71 @@
+"""Модуль массовых операций с избранным и списком покупок.
+
+Добавление выполняется одним `bulk_create(ignore_conflicts=True)`,
+удаление — одним отфильтрованным `delete()`. Уже существующие связи
+пользователя читаются заранее с блокировкой строк в той же
+транзакции. `bulk_create` не вызывает сигналы сохранения, поэтому при
+добавлении счётчики, кэш состояния пользователя и кэш сводного списка
+покупок обновляются здесь же. Удаление вызывает `post_delete` для
+каждой связи, и их обновляют обработчики сигналов.
+"""
+
+from django.db import transaction
+
+from recipes.counters import change_counters
+from recipes.models import FavoriteRecipe, Recipe, ShoppingList
+from recipes.shopping_list import invalidate_shopping_list
+from recipes.user_state import invalidate_user_state
+
+# Модель связи → счётчик рецепта.
+LINK_COUNTERS = {
+    FavoriteRecipe: 'favorites_count',
+    ShoppingList: 'shopping_cart_count',
+}
+
+ADDED = 'added'
+REMOVED = 'removed'
+ALREADY_ADDED = 'already_added'
+NOT_ADDED = 'not_added'
+NOT_FOUND = 'not_found'
+
+
+@transaction.atomic
+def add_links(model, user_id, recipe_ids):
+    """Добавляет рецепты `recipe_ids` в избранное или список покупок.
+
+    Возвращает словарь id рецепта → статус в порядке `recipe_ids`.
+    """
+    recipe_ids = list(dict.fromkeys(recipe_ids))
+    found = set(Recipe.objects.filter(
+        id__in=recipe_ids).values_list('id', flat=True))
+    present = set(model.objects.select_for_update().filter(
+        user_id=user_id, recipe_id__in=found
+    ).values_list('recipe_id', flat=True))
+    new_ids = [pk for pk in recipe_ids if pk in found and pk not in present]
+    if new_ids:
+        model.objects.bulk_create(
+            [model(user_id=user_id, recipe_id=pk) for pk in new_ids],
+            ignore_conflicts=True)
+        change_counters(Recipe, new_ids, LINK_COUNTERS[model], 1)
+        invalidate_user_state(user_id)
+        if model is ShoppingList:
+            invalidate_shopping_list(user_id)
+    return {
+        pk: (NOT_FOUND if pk not in found
+             else ALREADY_ADDED if pk in present else ADDED)
+        for pk in recipe_ids}
+
+
+@transaction.atomic
+def remove_links(model, user_id, recipe_ids):
+    """Удаляет рецепты `recipe_ids` из избранного или списка покупок.
+
+    Возвращает словарь id рецепта → статус в порядке `recipe_ids`.
+    """
+    recipe_ids = list(dict.fromkeys(recipe_ids))
+    links = model.objects.filter(user_id=user_id, recipe_id__in=recipe_ids)
+    removed = set(links.select_for_update().values_list(
+        'recipe_id', flat=True))
+    if removed:
+        links.delete()
+    return {pk: REMOVED if pk in removed else NOT_ADDED for pk in recipe_ids}
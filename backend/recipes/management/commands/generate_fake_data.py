@@ -0,0 +1,209 @@
+"""Команда Django для генерации синтетических данных для бенчмарков."""
+
+import random
+import secrets
+import time
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.cache import bump_generation
+from recipes.constants import FAKE_DATA_BATCH_SIZE
+from recipes.counters import COUNTERS, recount
+from recipes.models import (FavoriteRecipe, Ingredient, Recipe,
+                            RecipeIngredient, ShoppingList, Subscription, Tag)
+from recipes.search import update_search_index
+from recipes.timeline import rebuild_timelines
+from users.models import User
+
+FAKE_PASSWORD = 'benchmark-password'
+FAKE_UNITS = ('г', 'кг', 'мл', 'л', 'шт.', 'ст. л.', 'ч. л.')
+
+
+def zipf_weights(size, skew):
+    """Накопленные веса популярности по закону Ципфа: 1 / rank ** skew."""
+    return list(accumulate(1 / (rank ** skew) for rank in range(1, size + 1)))
+
+
+class Command(BaseCommand):
+    """Класс команды для заполнения базы синтетическими данными.
+
+    Создаёт пользователей, рецепты с ингредиентами и тегами, избранное,
+    списки покупок и подписки массовыми вставками. Популярность авторов
+    и рецептов распределена по закону Ципфа с параметром `--skew`,
+    поэтому у части авторов много подписчиков, а у части рецептов —
+    много добавлений в избранное. Счётчики и поисковый индекс
+    пересчитываются в конце.
+
+    Атрибут:
+        help (str): Описание команды для `manage.py help`.
+    """
+
+    help = 'Генерирует пользователей, рецепты и связи для бенчмарков'
+
+    def add_arguments(self, parser):
+        """
+        Добавляет аргументы командной строки.
+
+        Аргументы:
+            parser (ArgumentParser): Объект парсера аргументов.
+        """
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--recipes', type=int, default=1000)
+        parser.add_argument('--ingredients', type=int, default=2000,
+                            help='Минимальный размер справочника '
+                                 'ингредиентов.')
+        parser.add_argument('--ingredients-per-recipe', type=int, default=8)
+        parser.add_argument('--tags', type=int, default=6)
+        parser.add_argument('--tags-per-recipe', type=int, default=2)
+        parser.add_argument('--favorites', type=int, default=20,
+                            help='Избранных рецептов на пользователя.')
+        parser.add_argument('--cart', type=int, default=10,
+                            help='Рецептов в списке покупок пользователя.')
+        parser.add_argument('--subscriptions', type=int, default=10,
+                            help='Подписок на пользователя.')
+        parser.add_argument('--skew', type=float, default=1.1,
+                            help='Параметр распределения Ципфа (0 — '
+                                 'равномерное).')
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--batch-size', type=int,
+                            default=FAKE_DATA_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        """Основной метод выполнения команды.
+
+        Аргументы:
+            *args: Позиционные аргументы (не используются).
+            **options: Словарь аргументов командной строки.
+        """
+        if options['users'] < 1:
+            raise CommandError('Нужен хотя бы один пользователь.')
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.token = secrets.token_hex(3)
+        started = time.monotonic()
+        with transaction.atomic():
+            users = self.create_users(options['users'])
+            ingredients = self.ensure_ingredients(options['ingredients'])
+            tags = self.ensure_tags(options['tags'])
+            recipes = self.create_recipes(options['recipes'], users,
+                                          options['skew'])
+            self.create_recipe_ingredients(
+                recipes, ingredients, options['ingredients_per_recipe'])
+            self.create_recipe_tags(recipes, tags, options['tags_per_recipe'])
+            self.create_user_links(FavoriteRecipe, users, recipes,
+                                   options['favorites'], options['skew'])
+            self.create_user_links(ShoppingList, users, recipes,
+                                   options['cart'], options['skew'])
+            self.create_subscriptions(users, options['subscriptions'],
+                                      options['skew'])
+            for counter in COUNTERS:
+                recount(*counter)
+            for start in range(0, len(recipes), self.batch_size):
+                update_search_index(recipes[start:start + self.batch_size])
+            for start in range(0, len(users), self.batch_size):
+                rebuild_timelines([
+                    user.id for user in users[start:start + self.batch_size]])
+        for namespace in ('ingredients', 'tags', 'recipes'):
+            bump_generation(namespace)
+        self.stdout.write(self.style.SUCCESS(
+            f'Данные сгенерированы за {time.monotonic() - started:.1f} с '
+            f'(метка {self.token}).'))
+
+    def bulk_create(self, model, objects, **kwargs):
+        """Вставляет объекты пачками и сообщает их количество."""
+        created = model.objects.bulk_create(
+            objects, batch_size=self.batch_size, **kwargs)
+        self.stdout.write(f'{model.__name__}: {len(objects)}')
+        return created
+
+    def create_users(self, count):
+        password = make_password(FAKE_PASSWORD)
+        self.bulk_create(User, [
+            User(username=f'bench_{self.token}_{number}',
+                 email=f'bench_{self.token}_{number}@example.com',
+                 first_name='Бенчмарк',
+                 last_name=str(number),
+                 password=password)
+            for number in range(count)])
+        return list(User.objects.filter(
+            username__startswith=f'bench_{self.token}_').order_by('id'))
+
+    def ensure_ingredients(self, count):
+        missing = count - Ingredient.objects.count()
+        if missing > 0:
+            self.bulk_create(Ingredient, [
+                Ingredient(name=f'ингредиент {self.token} {number}',
+                           unit=self.random.choice(FAKE_UNITS))
+                for number in range(missing)], ignore_conflicts=True)
+        return list(Ingredient.objects.values_list('id', flat=True))
+
+    def ensure_tags(self, count):
+        existing = Tag.objects.count()
+        if existing < count:
+            self.bulk_create(Tag, [
+                Tag(name=f'Тег {self.token} {number}',
+                    slug=f'tag-{self.token}-{number}',
+                    color=f'#{self.random.randrange(0x1000000):06X}')
+                for number in range(count - existing)])
+        return list(Tag.objects.values_list('id', flat=True)[:count])
+
+    def create_recipes(self, count, users, skew):
+        authors = self.random.choices(
+            users, cum_weights=zipf_weights(len(users), skew), k=count)
+        self.bulk_create(Recipe, [
+            Recipe(name=f'Рецепт {number}',
+                   text='Синтетический рецепт для бенчмарка.',
+                   cooking_time=self.random.randint(5, 180),
+                   author=author,
+                   slug=f'bench-{self.token}-{number}')
+            for number, author in enumerate(authors)])
+        return list(Recipe.objects.filter(
+            slug__startswith=f'bench-{self.token}-').order_by(
+                'id').values_list('id', flat=True))
+
+    def create_recipe_ingredients(self, recipes, ingredients, per_recipe):
+        per_recipe = min(per_recipe, len(ingredients))
+        self.bulk_create(RecipeIngredient, [
+            RecipeIngredient(recipe_id=recipe, ingredient_id=ingredient,
+                             amount=self.random.randint(1, 500))
+            for recipe in recipes
+            for ingredient in self.random.sample(ingredients, per_recipe)])
+
+    def create_recipe_tags(self, recipes, tags, per_recipe):
+        per_recipe = min(per_recipe, len(tags))
+        through = Recipe.tags.through
+        self.bulk_create(through, [
+            through(recipe_id=recipe, tag_id=tag)
+            for recipe in recipes
+            for tag in self.random.sample(tags, per_recipe)])
+
+    def pick_popular(self, population, weights, count, exclude=None):
+        """Выбирает до `count` разных элементов с учётом популярности."""
+        chosen = set()
+        for _ in range(count * 3):
+            if len(chosen) >= count:
+                break
+            item = self.random.choices(population, cum_weights=weights)[0]
+            if item != exclude:
+                chosen.add(item)
+        return chosen
+
+    def create_user_links(self, model, users, recipes, per_user, skew):
+        weights = zipf_weights(len(recipes), skew)
+        self.bulk_create(model, [
+            model(user=user, recipe_id=recipe)
+            for user in users
+            for recipe in self.pick_popular(
+                recipes, weights, min(per_user, len(recipes)))
+        ], ignore_conflicts=True)
+
+    def create_subscriptions(self, users, per_user, skew):
+        weights = zipf_weights(len(users), skew)
+        self.bulk_create(Subscription, [
+            Subscription(subscriber=user, author=author)
+            for user in users
+            for author in self.pick_popular(
+                users, weights, min(per_user, len(users) - 1), exclude=user)])
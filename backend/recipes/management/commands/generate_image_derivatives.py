@@ -0,0 +1,68 @@
+"""Команда Django для построения уменьшенных копий изображений."""
+
+from django.core.management.base import BaseCommand
+
+from recipes.cache import bump_generation
+from recipes.constants import AVATAR_IMAGE_SIZES, RECIPE_IMAGE_SIZES
+from recipes.images import SOURCE_KEY, process_image
+from recipes.models import Recipe
+from users.models import User
+
+IMAGE_FIELDS = (
+    (Recipe, 'image', 'image_derivatives', RECIPE_IMAGE_SIZES),
+    (User, 'avatar', 'avatar_derivatives', AVATAR_IMAGE_SIZES),
+)
+
+
+class Command(BaseCommand):
+    """Класс команды для построения копий изображений без фонового пула.
+
+    Обрабатывает фото рецептов и аватары, для которых копии ещё
+    не построены или построены для другого файла, например после
+    загрузки изображений до появления копий.
+
+    Атрибут:
+        help (str): Описание команды для `manage.py help`.
+    """
+
+    help = 'Строит WebP-копии фото рецептов и аватаров'
+
+    def add_arguments(self, parser):
+        """
+        Добавляет аргументы командной строки.
+
+        Аргументы:
+            parser (ArgumentParser): Объект парсера аргументов.
+        """
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Перестроить копии для всех изображений.'
+        )
+
+    def handle(self, *args, **options):
+        """Основной метод выполнения команды.
+
+        Аргументы:
+            *args: Позиционные аргументы (не используются).
+            **options: Словарь аргументов командной строки.
+        """
+        for model, field_name, derivatives_field, sizes in IMAGE_FIELDS:
+            processed = 0
+            rows = model.objects.exclude(**{field_name: ''}).values_list(
+                'pk', field_name, derivatives_field).iterator()
+            for pk, name, derivatives in rows:
+                if (not options['force']
+                        and (derivatives or {}).get(SOURCE_KEY) == name):
+                    continue
+                try:
+                    process_image(model, pk, field_name, derivatives_field,
+                                  sizes)
+                except OSError as error:
+                    self.stderr.write(self.style.WARNING(
+                        f'{model.__name__} {pk}: {error}'))
+                    continue
+                processed += 1
+            self.stdout.write(self.style.SUCCESS(
+                f'{model.__name__}.{field_name}: обработано {processed}.'))
+        bump_generation('recipes')
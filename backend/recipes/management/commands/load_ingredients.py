@@ -1,26 +1,36 @@
-"""Команда Django для загрузки ингредиентов из CSV-файла в базу данных."""
+"""Команда Django для загрузки ингредиентов из CSV или JSON в базу данных."""
 
 import csv
+import io
+import json
 import os
+import time
 
 from django.conf import settings
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
 
+from recipes.cache import bump_generation
+from recipes.constants import INGREDIENTS_LOAD_BATCH_SIZE
 from recipes.models import Ingredient
 
 
 class Command(BaseCommand):
-    """Класс команды для импорта ингредиентов из CSV-файла.
+    """Класс команды для импорта ингредиентов из CSV- или JSON-файла.
 
-    Команда загружает данные в модель `Ingredient` из CSV-файла без заголовков.
-    Формат CSV-файла: каждая строка содержит название ингредиента
-    и его единицу измерения.
+    Команда загружает данные в модель `Ingredient` пачками в одной
+    транзакции. Формат CSV-файла: строки без заголовков, каждая содержит
+    название ингредиента и его единицу измерения. Формат JSON-файла:
+    список объектов с ключами `name` и `measurement_unit`.
+
+    Повторный запуск безопасен: пары (название, единица), которые уже
+    есть в базе, пропускаются по уникальному ограничению.
 
     Атрибут:
         help (str): Описание команды для `manage.py help`.
     """
 
-    help = 'Загружает ингредиенты из CSV файла (без заголовков)'
+    help = 'Загружает ингредиенты из CSV (без заголовков) или JSON файла'
 
     def add_arguments(self, parser):
         """
@@ -35,42 +45,133 @@ class Command(BaseCommand):
             help='/data/ingredients.csv/',
             default=os.path.join(settings.BASE_DIR, 'data', 'ingredients.csv')
         )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=INGREDIENTS_LOAD_BATCH_SIZE,
+            help='Количество строк в одной пачке вставки.'
+        )
+        parser.add_argument(
+            '--mode',
+            choices=('auto', 'bulk', 'copy'),
+            default='auto',
+            help=('Способ вставки: bulk_create или COPY через временную '
+                  'таблицу (только PostgreSQL). По умолчанию COPY '
+                  'используется, если он доступен.')
+        )
 
     def handle(self, *args, **options):
         """Основной метод выполнения команды.
 
-        Читает CSV-файл, парсит данные и добавляет новые ингредиенты
-        в базу данных.
+        Читает файл пачками, убирает повторы и добавляет новые
+        ингредиенты в базу данных в одной транзакции.
 
         Аргументы:
             *args: Позиционные аргументы (не используются).
             **options: Словарь аргументов командной строки.
         """
-        csv_path = options['path']
-        self.stdout.write(f'Чтение файла: {csv_path}')
+        path = options['path']
+        batch_size = options['batch_size']
+        mode = options['mode']
+        if mode == 'auto':
+            mode = 'copy' if self.copy_supported() else 'bulk'
+        elif mode == 'copy' and not self.copy_supported():
+            raise CommandError('COPY доступен только для PostgreSQL.')
+        self.stdout.write(f'Чтение файла: {path}')
 
+        started = time.monotonic()
         try:
-            with open(csv_path, newline='', encoding='utf-8') as csvfile:
-                reader = csv.reader(csvfile)
-                count = 0
-                for row in reader:
-                    if not row or len(row) < 2:
-                        self.stdout.write(
-                            'Пропущена пустая или некорректная строка.')
-                        continue
-                    name = row[0].strip()
-                    unit = row[1].strip()
-                    if not name:
-                        self.stdout.write(
-                            'Строка пропущена, т.к. имя не указано.')
-                        continue
-                    ingredient, created = Ingredient.objects.get_or_create(
-                        name=name,
-                        defaults={'unit': unit}
-                    )
-                    if created:
-                        count += 1
-                self.stdout.write(self.style.SUCCESS(
-                    f'Загружено {count} ингредиентов.'))
+            with transaction.atomic():
+                count_before = Ingredient.objects.count()
+                total = 0
+                for batch in self.read_batches(path, batch_size):
+                    total += len(batch)
+                    if mode == 'copy':
+                        self.copy_batch(batch)
+                    else:
+                        Ingredient.objects.bulk_create(
+                            [Ingredient(name=name, unit=unit)
+                             for name, unit in batch],
+                            batch_size=batch_size,
+                            ignore_conflicts=True)
+                if mode == 'copy':
+                    self.flush_staging()
+                count = Ingredient.objects.count() - count_before
         except FileNotFoundError:
-            self.stderr.write(self.style.ERROR(f'Файл не найден: {csv_path}'))
+            self.stderr.write(self.style.ERROR(f'Файл не найден: {path}'))
+            return
+        bump_generation('ingredients')
+
+        elapsed = time.monotonic() - started
+        rate = total / elapsed if elapsed else total
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено {count} ингредиентов из {total} строк '
+            f'за {elapsed:.2f} с ({rate:.0f} строк/с, режим {mode}).'))
+
+    def read_rows(self, path):
+        """Читает пары (название, единица) из CSV- или JSON-файла."""
+        if path.lower().endswith('.json'):
+            with open(path, encoding='utf-8') as jsonfile:
+                for item in json.load(jsonfile):
+                    yield (item.get('name', ''),
+                           item.get('measurement_unit', item.get('unit', '')))
+            return
+        with open(path, newline='', encoding='utf-8') as csvfile:
+            for row in csv.reader(csvfile):
+                if not row or len(row) < 2:
+                    self.stdout.write(
+                        'Пропущена пустая или некорректная строка.')
+                    continue
+                yield row[0], row[1]
+
+    def read_batches(self, path, batch_size):
+        """Группирует строки файла в пачки без повторов."""
+        seen = set()
+        batch = []
+        for name, unit in self.read_rows(path):
+            name = name.strip()
+            unit = unit.strip()
+            if not name:
+                self.stdout.write('Строка пропущена, т.к. имя не указано.')
+                continue
+            if (name, unit) in seen:
+                continue
+            seen.add((name, unit))
+            batch.append((name, unit))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    @staticmethod
+    def copy_supported():
+        """Проверяет, можно ли загрузить данные через COPY."""
+        return connection.vendor == 'postgresql'
+
+    def copy_batch(self, batch):
+        """Копирует пачку строк во временную таблицу через COPY."""
+        with connection.cursor() as cursor:
+            if not getattr(self, '_staging_created', False):
+                cursor.execute(
+                    'CREATE TEMPORARY TABLE ingredient_staging '
+                    '(name varchar(100), unit varchar(50)) ON COMMIT DROP')
+                self._staging_created = True
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(batch)
+            buffer.seek(0)
+            cursor.copy_expert(
+                'COPY ingredient_staging (name, unit) FROM STDIN '
+                'WITH (FORMAT csv)', buffer)
+
+    def flush_staging(self):
+        """Переносит строки из временной таблицы, пропуская существующие."""
+        if not getattr(self, '_staging_created', False):
+            return
+        table = connection.ops.quote_name(Ingredient._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} (name, unit) '
+                'SELECT DISTINCT name, unit FROM ingredient_staging '
+                'ON CONFLICT (name, unit) DO NOTHING')
+        self._staging_created = False
@@ -0,0 +1,29 @@
+"""Команда Django для перестроения поискового индекса рецептов."""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.search import update_search_index
+
+
+class Command(BaseCommand):
+    """Класс команды для полного пересчёта поискового индекса рецептов.
+
+    Нужна после массовой загрузки рецептов в обход ORM или сигналов.
+
+    Атрибут:
+        help (str): Описание команды для `manage.py help`.
+    """
+
+    help = 'Перестраивает полнотекстовый индекс рецептов'
+
+    def handle(self, *args, **options):
+        """Основной метод выполнения команды.
+
+        Аргументы:
+            *args: Позиционные аргументы (не используются).
+            **options: Словарь аргументов командной строки.
+        """
+        with transaction.atomic():
+            update_search_index()
+        self.stdout.write(self.style.SUCCESS('Поисковый индекс перестроен.'))
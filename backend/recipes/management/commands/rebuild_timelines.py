@@ -0,0 +1,34 @@
+"""Команда Django для перестроения лент рецептов подписчиков."""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.constants import TIMELINE_BATCH_SIZE
+from recipes.timeline import rebuild_timelines
+from users.models import User
+
+
+class Command(BaseCommand):
+    """Класс команды для сборки лент заново по подпискам.
+
+    Нужна после миграции, добавившей ленты, и после массовой загрузки
+    рецептов или подписок в обход сигналов.
+
+    Атрибут:
+        help (str): Описание команды для `manage.py help`.
+    """
+
+    help = 'Перестраивает ленты рецептов подписчиков'
+
+    def handle(self, *args, **options):
+        """Основной метод выполнения команды.
+
+        Аргументы:
+            *args: Позиционные аргументы (не используются).
+            **options: Словарь аргументов командной строки.
+        """
+        user_ids = list(User.objects.values_list('id', flat=True))
+        for start in range(0, len(user_ids), TIMELINE_BATCH_SIZE):
+            with transaction.atomic():
+                rebuild_timelines(user_ids[start:start + TIMELINE_BATCH_SIZE])
+        self.stdout.write(self.style.SUCCESS('Ленты перестроены.'))
@@ -0,0 +1,52 @@
+"""Команда Django для пересчёта денормализованных счётчиков."""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.counters import COUNTERS, find_drift, recount
+
+
+class Command(BaseCommand):
+    """Класс команды для проверки и исправления счётчиков.
+
+    Сравнивает `User.recipes_count`, `User.subscribers_count`,
+    `Recipe.favorites_count` и `Recipe.shopping_cart_count`
+    с фактическим количеством записей и исправляет расхождения.
+
+    Атрибут:
+        help (str): Описание команды для `manage.py help`.
+    """
+
+    help = 'Пересчитывает счётчики рецептов, избранного и списков покупок'
+
+    def add_arguments(self, parser):
+        """
+        Добавляет аргументы командной строки.
+
+        Аргументы:
+            parser (ArgumentParser): Объект парсера аргументов.
+        """
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только показать расхождения, не исправляя их.'
+        )
+
+    def handle(self, *args, **options):
+        """Основной метод выполнения команды.
+
+        Аргументы:
+            *args: Позиционные аргументы (не используются).
+            **options: Словарь аргументов командной строки.
+        """
+        with transaction.atomic():
+            for model, field, related_model, related_field in COUNTERS:
+                label = f'{model.__name__}.{field}'
+                if options['check']:
+                    count = find_drift(
+                        model, field, related_model, related_field).count()
+                    self.stdout.write(f'{label}: расхождений {count}.')
+                    continue
+                count = recount(model, field, related_model, related_field)
+                self.stdout.write(self.style.SUCCESS(
+                    f'{label}: исправлено {count} записей.'))
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.5 on 2026-10-18 05:56
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_ingredient_unique_name_unit'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-creation_date', '-id'], name='recipe_feed_idx'),
+        ),
+    ]
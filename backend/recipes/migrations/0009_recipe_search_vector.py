@@ -0,0 +1,72 @@
+# Generated by Django 5.1.5 on 2026-10-18 06:06
+
+import django.contrib.postgres.search
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+SEARCH_CONFIG = 'russian'
+GIN_INDEX_NAME = 'recipes_recipe_search_vector_gin'
+FTS_TABLE = 'recipes_recipe_fts'
+
+
+def create_search_index(apps, schema_editor):
+    """Создаёт и заполняет поисковый индекс рецептов.
+
+    На PostgreSQL — GIN-индекс по `search_vector`, на SQLite —
+    теневая таблица FTS5.
+    """
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        Recipe = apps.get_model('recipes', 'Recipe')
+        RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {GIN_INDEX_NAME} '
+            'ON recipes_recipe USING gin (search_vector)')
+        ingredient_names = Subquery(
+            RecipeIngredient.objects.filter(recipe=OuterRef('pk')).order_by()
+            .values('recipe').annotate(
+                names=StringAgg('ingredient__name', ' ')).values('names'))
+        Recipe.objects.update(search_vector=(
+            SearchVector('name', weight='A', config=SEARCH_CONFIG)
+            + SearchVector(ingredient_names, weight='B',
+                           config=SEARCH_CONFIG)
+            + SearchVector('text', weight='C', config=SEARCH_CONFIG)))
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} '
+            'USING fts5(name, ingredients, text)')
+        schema_editor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, name, ingredients, text) '
+            'SELECT recipe.id, recipe.name, ('
+            "    SELECT group_concat(ingredient.name, ' ') "
+            '    FROM recipes_recipeingredient link '
+            '    JOIN recipes_ingredient ingredient '
+            '    ON ingredient.id = link.ingredient_id '
+            '    WHERE link.recipe_id = recipe.id'
+            '), recipe.text FROM recipes_recipe recipe')
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(f'DROP INDEX IF EXISTS {GIN_INDEX_NAME}')
+    elif vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
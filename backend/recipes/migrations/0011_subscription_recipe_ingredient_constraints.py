@@ -0,0 +1,64 @@
+# Generated by Django 5.1.5 on 2026-10-18 06:12
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F, Min, Sum
+
+MAX_AMOUNT = 10000
+
+
+def remove_duplicate_links(apps, schema_editor):
+    """Удаляет повторные подписки и объединяет повторные ингредиенты.
+
+    Из повторных подписок остаётся самая ранняя, подписки на себя
+    удаляются. Количества повторного ингредиента в рецепте
+    складываются в самую раннюю строку.
+    """
+    Subscription = apps.get_model('recipes', 'Subscription')
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+    Subscription.objects.filter(subscriber=F('author')).delete()
+    duplicates = Subscription.objects.values('subscriber', 'author').annotate(
+        keep_id=Min('id'), total=Count('id')).filter(total__gt=1)
+    for duplicate in duplicates:
+        Subscription.objects.filter(
+            subscriber=duplicate['subscriber'], author=duplicate['author']
+        ).exclude(id=duplicate['keep_id']).delete()
+    duplicates = RecipeIngredient.objects.values(
+        'recipe', 'ingredient').annotate(
+            keep_id=Min('id'), total=Count('id'),
+            amount=Sum('amount')).filter(total__gt=1)
+    for duplicate in duplicates:
+        RecipeIngredient.objects.filter(
+            recipe=duplicate['recipe'], ingredient=duplicate['ingredient']
+        ).exclude(id=duplicate['keep_id']).delete()
+        RecipeIngredient.objects.filter(id=duplicate['keep_id']).update(
+            amount=min(duplicate['amount'], MAX_AMOUNT))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_recipe_image_derivatives'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_links,
+                             migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['author', '-creation_date', '-id'], name='recipe_author_feed_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='recipeingredient',
+            constraint=models.UniqueConstraint(fields=('recipe', 'ingredient'), name='unique_recipe_ingredient'),
+        ),
+        migrations.AddConstraint(
+            model_name='subscription',
+            constraint=models.UniqueConstraint(fields=('subscriber', 'author'), name='unique_subscription'),
+        ),
+        migrations.AddConstraint(
+            model_name='subscription',
+            constraint=models.CheckConstraint(check=models.Q(('subscriber', models.F('author')), _negated=True), name='prevent_self_subscription'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.1.5 on 2026-10-18 06:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_subscribers_count(apps, schema_editor):
+    """Заполняет счётчик подписчиков по существующим подпискам."""
+    User = apps.get_model('users', 'User')
+    Subscription = apps.get_model('recipes', 'Subscription')
+    User.objects.update(subscribers_count=Coalesce(Subquery(
+        Subscription.objects.filter(author=OuterRef('pk')).order_by().values(
+            'author').annotate(total=Count('pk')).values('total')), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_subscription_recipe_ingredient_constraints'),
+        ('users', '0005_user_subscribers_count'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimelineEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('creation_date', models.DateField(verbose_name='Дата создания рецепта')),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to='recipes.recipe', verbose_name='Рецепт')),
+                ('subscriber', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline', to=settings.AUTH_USER_MODEL, verbose_name='Подписчик')),
+            ],
+            options={
+                'verbose_name': 'Запись ленты',
+                'verbose_name_plural': 'Записи ленты',
+                'indexes': [models.Index(fields=['subscriber', '-creation_date', '-recipe'], name='timeline_feed_idx')],
+                'constraints': [models.UniqueConstraint(fields=('subscriber', 'recipe'), name='unique_timeline_entry')],
+            },
+        ),
+        migrations.RunPython(fill_subscribers_count,
+                             migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.1.5 on 2026-10-18 12:10
+
+from django.db import migrations
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+# Значения из recipes.constants на момент миграции.
+TIMELINE_LENGTH = 300
+TIMELINE_FANOUT_LIMIT = 5000
+TIMELINE_BATCH_SIZE = 1000
+SUBSCRIBERS_BATCH_SIZE = 100
+
+
+def fill_timelines(apps, schema_editor):
+    """Заполняет ленты подписчиков по существующим подпискам.
+
+    В ленту попадают последние `TIMELINE_LENGTH` рецептов авторов,
+    у которых не больше `TIMELINE_FANOUT_LIMIT` подписчиков: рецепты
+    крупных авторов добавляются к ленте при чтении.
+    """
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Subscription = apps.get_model('recipes', 'Subscription')
+    TimelineEntry = apps.get_model('recipes', 'TimelineEntry')
+    subscriber_ids = list(Subscription.objects.filter(
+        author__subscribers_count__lte=TIMELINE_FANOUT_LIMIT
+    ).order_by('subscriber_id').values_list(
+        'subscriber_id', flat=True).distinct())
+    for start in range(0, len(subscriber_ids), SUBSCRIBERS_BATCH_SIZE):
+        batch = subscriber_ids[start:start + SUBSCRIBERS_BATCH_SIZE]
+        rows = Recipe.objects.filter(
+            author__subscribers__subscriber_id__in=batch,
+            author__subscribers_count__lte=TIMELINE_FANOUT_LIMIT
+        ).annotate(
+            subscriber=F('author__subscribers__subscriber_id'),
+            position=Window(
+                RowNumber(),
+                partition_by=F('author__subscribers__subscriber_id'),
+                order_by=(F('creation_date').desc(), F('id').desc()))
+        ).filter(position__lte=TIMELINE_LENGTH).values_list(
+            'subscriber', 'author_id', 'id', 'creation_date')
+        TimelineEntry.objects.bulk_create(
+            [TimelineEntry(subscriber_id=subscriber_id, author_id=author_id,
+                           recipe_id=recipe_id, creation_date=creation_date)
+             for subscriber_id, author_id, recipe_id, creation_date in rows],
+            batch_size=TIMELINE_BATCH_SIZE, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0013_recipe_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_timelines, migrations.RunPython.noop),
+    ]
@@ -1,12 +1,19 @@
 """Модуль моделей для работы с рецептами и подписками."""
 
+import re
+import secrets
+
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, Prefetch, Window
+from django.db.models.functions import Length, RowNumber
 
 from slugify import slugify
 
 from recipes.constants import (MAX_LENGHT_NAME, MAX_LENGHT_NAME_TAG,
-                               MAX_LENGHT_NAME_TEXT, MAX_LENGHT_UNIT)
+                               MAX_LENGHT_NAME_TEXT, MAX_LENGHT_UNIT,
+                               SLUG_MAX_ATTEMPTS, SLUG_SUFFIX_RESERVE)
 from users.models import User
 
 
@@ -29,6 +36,11 @@ class Ingredient(models.Model):
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
         ordering = ('name',)
+        constraints = [
+            models.UniqueConstraint(
+                fields=('name', 'unit'),
+                name='unique_ingredient_name_unit'),
+        ]
 
     def __str__(self):
         return self.name
@@ -64,6 +76,40 @@ class Tag(models.Model):
         return self.name
 
 
+class RecipeQuerySet(models.QuerySet):
+    """QuerySet рецептов с заготовками для выдачи через API."""
+
+    def with_related(self):
+        """Подгружает автора, теги и ингредиенты фиксированным числом запросов.
+
+        Независимо от размера страницы выполняется один запрос рецептов
+        с JOIN автора и по одному запросу на теги и ингредиенты.
+        Поисковый вектор в ответах не нужен и не загружается.
+        """
+        return self.select_related('author').defer(
+            'search_vector').prefetch_related(
+            'tags',
+            Prefetch(
+                'recipe_ingredients',
+                queryset=RecipeIngredient.objects.select_related(
+                    'ingredient')))
+
+    def latest_by_author(self, author_ids, limit):
+        """Последние `limit` рецептов каждого автора одним запросом.
+
+        Нумерует рецепты внутри автора оконной функцией
+        ROW_NUMBER() OVER (PARTITION BY author_id ...) и оставляет
+        первые `limit` строк каждой партиции.
+        """
+        return self.filter(author_id__in=author_ids).annotate(
+            author_position=Window(
+                RowNumber(),
+                partition_by=F('author_id'),
+                order_by=(F('creation_date').desc(), F('id').desc()))
+        ).filter(author_position__lte=limit).order_by(
+            'author_id', 'author_position')
+
+
 class Recipe(models.Model):
     """Модель для страницы рецепта пользователя.
 
@@ -82,6 +128,11 @@ class Recipe(models.Model):
         upload_to='recipes/images/',
         verbose_name='Фото рецепта',
         blank=True)
+    image_derivatives = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name='Уменьшенные копии фото')
     cooking_time = models.PositiveSmallIntegerField(
         verbose_name='Время приготовления рецепта в минутах',
         validators=[MinValueValidator(1), MaxValueValidator(1440)],
@@ -107,11 +158,36 @@ class Recipe(models.Model):
     creation_date = models.DateField(
         auto_now_add=True,
         verbose_name='Дата создания рецепта')
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения рецепта')
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Добавлений в избранное')
+    shopping_cart_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Добавлений в список покупок')
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        verbose_name='Поисковый вектор')
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ('-creation_date',)
+        indexes = [
+            models.Index(
+                fields=('-creation_date', '-id'),
+                name='recipe_feed_idx'),
+            models.Index(
+                fields=('author', '-creation_date', '-id'),
+                name='recipe_author_feed_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -121,17 +197,50 @@ class Recipe(models.Model):
 
         Для того, чтобы генерировать уникальный слаг для рецепта.
         Если слаг не задан, он создается автоматически на основе
-        названия рецепта.
+        названия рецепта. Вместо проверки перед вставкой слаг
+        занимается самой вставкой: при конфликте уникальности слаг
+        вычисляется заново, а после `SLUG_MAX_ATTEMPTS` попыток к нему
+        добавляется случайный суффикс.
+        """
+        if self.slug:
+            return super().save(*args, **kwargs)
+        base_slug = slugify(
+            self.name,
+            max_length=self._meta.get_field('slug').max_length
+            - SLUG_SUFFIX_RESERVE) or 'recipe'
+        for attempt in range(SLUG_MAX_ATTEMPTS + 1):
+            if attempt < SLUG_MAX_ATTEMPTS:
+                self.slug = self.get_next_free_slug(base_slug)
+            else:
+                self.slug = f'{base_slug}-{secrets.token_hex(3)}'
+            try:
+                with transaction.atomic():
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                slug_taken = Recipe.objects.filter(slug=self.slug).exists()
+                self.slug = ''
+                if not slug_taken or attempt == SLUG_MAX_ATTEMPTS:
+                    raise
+
+    @classmethod
+    def get_next_free_slug(cls, base_slug):
+        """Возвращает следующий свободный слаг одним запросом.
+
+        Среди слагов вида `base` и `base-N` выбирается слаг с наибольшим
+        номером: более длинный номер больше, а при равной длине
+        сравнение строк совпадает с числовым.
         """
-        if not self.slug:
-            base_slug = slugify(self.name)
-            slug = base_slug
-            counter = 1
-            while Recipe.objects.filter(slug=slug).exists():
-                slug = f'{base_slug}-{counter}'
-                counter += 1
-            self.slug = slug
-        super().save(*args, **kwargs)
+        last_slug = cls.objects.filter(
+            slug__startswith=base_slug,
+            slug__regex=rf'^{re.escape(base_slug)}(-[0-9]+)?$'
+        ).annotate(
+            slug_length=Length('slug')
+        ).order_by('-slug_length', '-slug').values_list(
+            'slug', flat=True).first()
+        if last_slug is None:
+            return base_slug
+        suffix = last_slug[len(base_slug) + 1:]
+        return f'{base_slug}-{int(suffix) + 1 if suffix else 1}'
 
 
 class RecipeIngredient(models.Model):
@@ -158,6 +267,11 @@ class RecipeIngredient(models.Model):
     class Meta:
         verbose_name = 'Ингредиент рецепта'
         verbose_name_plural = 'Ингредиенты рецепта'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('recipe', 'ingredient'),
+                name='unique_recipe_ingredient'),
+        ]
 
     def __str__(self):
         return (
@@ -243,6 +357,59 @@ class Subscription(models.Model):
     class Meta:
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('subscriber', 'author'),
+                name='unique_subscription'),
+            models.CheckConstraint(
+                check=~models.Q(subscriber=models.F('author')),
+                name='prevent_self_subscription'),
+        ]
 
     def __str__(self):
         return f'{self.author} -> {self.subscriber}'
+
+
+class TimelineEntry(models.Model):
+    """Модель записи ленты рецептов подписчика.
+
+    При публикации рецепта запись добавляется в ленты подписчиков
+    автора, поэтому лента читается по индексу одного пользователя
+    без соединения подписок и рецептов. Дата рецепта копируется
+    в запись, чтобы индекс покрывал сортировку ленты.
+    """
+
+    subscriber = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Подписчик')
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор')
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Рецепт')
+    creation_date = models.DateField(
+        verbose_name='Дата создания рецепта')
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('subscriber', 'recipe'),
+                name='unique_timeline_entry'),
+        ]
+        indexes = [
+            models.Index(
+                fields=('subscriber', '-creation_date', '-recipe'),
+                name='timeline_feed_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.subscriber_id} <- {self.recipe_id}'
@@ -0,0 +1,217 @@
+"""Модуль поиска по ингредиентам и рецептам.
+
+На PostgreSQL поиск ингредиентов опирается на GIN-индекс `pg_trgm`
+по `UPPER(name)`, который обслуживает и `istartswith`, и `icontains`.
+На остальных СУБД (SQLite для локальной разработки и тестов)
+используется индекс префиксов в памяти процесса: отсортированный
+массив названий.
+
+Полнотекстовый поиск рецептов идёт по названию, ингредиентам
+и описанию. На PostgreSQL это поле `Recipe.search_vector` с GIN-индексом,
+на SQLite — теневая таблица FTS5. Индекс обновляется сигналами
+и явными вызовами `update_search_index` после массовых вставок.
+"""
+
+import re
+from bisect import bisect_left
+from threading import Lock
+
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector)
+from django.db import connections
+from django.db.models import (Case, F, FloatField, IntegerField, OuterRef, Q,
+                              Subquery, Value, When)
+from django.db.models.expressions import RawSQL
+
+from recipes.cache import get_generation
+from recipes.constants import (INGREDIENT_AUTOCOMPLETE_LIMIT,
+                               RECIPE_SEARCH_CONFIG)
+from recipes.models import Ingredient, Recipe, RecipeIngredient
+
+RECIPE_FTS_TABLE = 'recipes_recipe_fts'
+RECIPE_FTS_WEIGHTS = (10.0, 4.0, 1.0)
+SEARCH_TERM_RE = re.compile(r'\w+')
+
+
+class IngredientPrefixIndex:
+    """Индекс названий ингредиентов в памяти процесса.
+
+    Хранит отсортированные пары (название в нижнем регистре, id).
+    Префиксы ищутся бинарным поиском, вхождения подстроки — проходом
+    по массиву без обращения к БД. Индекс строится лениво и
+    перестраивается, когда меняется поколение `ingredients`, которое
+    увеличивают сигналы сохранения и удаления ингредиентов.
+    """
+
+    def __init__(self):
+        self._names = None
+        self._ids = None
+        self._generation = None
+        self._lock = Lock()
+
+    def _load(self, queryset):
+        generation = get_generation('ingredients')
+        with self._lock:
+            if self._names is None or self._generation != generation:
+                rows = sorted(
+                    (name.lower(), pk) for pk, name in
+                    queryset.model.objects.using(queryset.db).values_list(
+                        'pk', 'name').iterator())
+                self._names = [name for name, _ in rows]
+                self._ids = [pk for _, pk in rows]
+                self._generation = generation
+            return self._names, self._ids
+
+    def search(self, queryset, value, limit):
+        """Возвращает id ингредиентов: сначала по префиксу, затем по вхождению.
+
+        Внутри каждой группы результаты упорядочены по названию.
+        """
+        names, ids = self._load(queryset)
+        value = value.lower()
+        result = []
+        position = bisect_left(names, value)
+        while (position < len(names) and len(result) < limit
+               and names[position].startswith(value)):
+            result.append(ids[position])
+            position += 1
+        if len(result) < limit:
+            for name, pk in zip(names, ids):
+                if value in name and not name.startswith(value):
+                    result.append(pk)
+                    if len(result) >= limit:
+                        break
+        return result
+
+
+ingredient_prefix_index = IngredientPrefixIndex()
+
+
+def autocomplete_ingredients(queryset, value,
+                             limit=INGREDIENT_AUTOCOMPLETE_LIMIT):
+    """Ищет ингредиенты для автодополнения.
+
+    Совпадения по началу названия идут первыми, затем совпадения
+    по подстроке; количество результатов ограничено `limit`.
+    """
+    value = value.strip()
+    if not value:
+        return queryset
+    if connections[queryset.db].vendor == 'postgresql':
+        return queryset.filter(name__icontains=value).annotate(
+            match_rank=Case(
+                When(name__istartswith=value, then=Value(0)),
+                default=Value(1),
+                output_field=IntegerField())
+        ).order_by('match_rank', 'name')[:limit]
+    ids = ingredient_prefix_index.search(queryset, value, limit)
+    return queryset.filter(pk__in=ids).order_by(Case(
+        *[When(pk=pk, then=Value(position))
+          for position, pk in enumerate(ids)],
+        output_field=IntegerField()))
+
+
+def get_search_vector():
+    """Возвращает выражение поискового вектора рецепта для PostgreSQL.
+
+    Название весит больше ингредиентов, ингредиенты — больше описания.
+    """
+    ingredient_names = Subquery(
+        RecipeIngredient.objects.filter(recipe=OuterRef('pk')).order_by()
+        .values('recipe').annotate(
+            names=StringAgg('ingredient__name', ' ')).values('names'))
+    return (
+        SearchVector('name', weight='A', config=RECIPE_SEARCH_CONFIG)
+        + SearchVector(ingredient_names, weight='B',
+                       config=RECIPE_SEARCH_CONFIG)
+        + SearchVector('text', weight='C', config=RECIPE_SEARCH_CONFIG))
+
+
+def update_search_index(recipe_ids=None):
+    """Пересчитывает поисковый индекс рецептов.
+
+    Без `recipe_ids` индекс перестраивается целиком.
+    """
+    if recipe_ids is not None:
+        recipe_ids = list(recipe_ids)
+        if not recipe_ids:
+            return
+    connection = connections[Recipe.objects.db]
+    if connection.vendor == 'postgresql':
+        queryset = Recipe.objects.all()
+        if recipe_ids is not None:
+            queryset = queryset.filter(pk__in=recipe_ids)
+        queryset.update(search_vector=get_search_vector())
+    elif connection.vendor == 'sqlite':
+        quote = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            if recipe_ids is None:
+                cursor.execute(f'DELETE FROM {RECIPE_FTS_TABLE}')
+                where = ''
+            else:
+                placeholders = ', '.join(['%s'] * len(recipe_ids))
+                cursor.execute(
+                    f'DELETE FROM {RECIPE_FTS_TABLE} '
+                    f'WHERE rowid IN ({placeholders})', recipe_ids)
+                where = f'WHERE recipe.id IN ({placeholders})'
+            cursor.execute(
+                f'INSERT INTO {RECIPE_FTS_TABLE} '
+                '(rowid, name, ingredients, text) '
+                'SELECT recipe.id, recipe.name, ('
+                "    SELECT group_concat(ingredient.name, ' ') "
+                f'    FROM {quote(RecipeIngredient._meta.db_table)} link '
+                f'    JOIN {quote(Ingredient._meta.db_table)} ingredient '
+                '    ON ingredient.id = link.ingredient_id '
+                '    WHERE link.recipe_id = recipe.id'
+                '), recipe.text '
+                f'FROM {quote(Recipe._meta.db_table)} recipe {where}',
+                recipe_ids or [])
+
+
+def delete_from_search_index(recipe_id):
+    """Удаляет рецепт из теневой таблицы FTS5 на SQLite."""
+    connection = connections[Recipe.objects.db]
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {RECIPE_FTS_TABLE} WHERE rowid = %s',
+                [recipe_id])
+
+
+def search_recipes(queryset, value):
+    """Фильтрует рецепты по поисковому запросу и аннотирует релевантность.
+
+    Аннотация `search_rank` больше у более релевантных рецептов.
+    На PostgreSQL запрос разбирается как в веб-поиске (`websearch`),
+    на SQLite каждое слово ищется по префиксу, на остальных СУБД
+    выполняется поиск подстроки в названии и описании.
+    """
+    value = value.strip()
+    if not value:
+        return queryset
+    vendor = connections[queryset.db].vendor
+    if vendor == 'postgresql':
+        query = SearchQuery(value, config=RECIPE_SEARCH_CONFIG,
+                            search_type='websearch')
+        return queryset.filter(search_vector=query).annotate(
+            search_rank=SearchRank(F('search_vector'), query))
+    if vendor == 'sqlite':
+        terms = SEARCH_TERM_RE.findall(value)
+        if not terms:
+            return queryset.none()
+        match = ' '.join(f'"{term}"*' for term in terms)
+        weights = ', '.join(str(weight) for weight in RECIPE_FTS_WEIGHTS)
+        table = connections[queryset.db].ops.quote_name(
+            Recipe._meta.db_table)
+        return queryset.filter(pk__in=RawSQL(
+            f'SELECT rowid FROM {RECIPE_FTS_TABLE} '
+            f'WHERE {RECIPE_FTS_TABLE} MATCH %s', (match,))
+        ).annotate(search_rank=RawSQL(
+            f'SELECT -bm25({RECIPE_FTS_TABLE}, {weights}) '
+            f'FROM {RECIPE_FTS_TABLE} WHERE {RECIPE_FTS_TABLE} MATCH %s '
+            f'AND rowid = {table}.id', (match,),
+            output_field=FloatField()))
+    return queryset.filter(
+        Q(name__icontains=value) | Q(text__icontains=value)
+    ).annotate(search_rank=Value(0.0, output_field=FloatField()))
@@ -0,0 +1,119 @@
+"""Модуль сводного списка покупок пользователя.
+
+Количества ингредиентов из рецептов списка покупок суммируются одним
+сгруппированным запросом, отсортированным в БД. Одинаковые
+ингредиенты в совместимых единицах (г и кг, мл и л) объединяются
+в меньшую единицу. При промахе кэша строки отдаются по мере чтения
+из курсора БД. Список не длиннее `SHOPPING_LIST_CACHE_MAX_ROWS` строк
+хранится в общем кэше, пока пользователь не изменит список покупок
+или не изменятся ингредиенты рецептов.
+"""
+
+from itertools import groupby
+
+from django.db import transaction
+from django.db.models import F, Sum
+
+from recipes.cache import bump_generation, get_cache, get_generation
+from recipes.constants import (SHOPPING_CART_CHUNK_SIZE,
+                               SHOPPING_LIST_CACHE_MAX_ROWS,
+                               SHOPPING_LIST_CACHE_TIMEOUT, UNIT_CONVERSIONS)
+from recipes.models import RecipeIngredient, ShoppingList
+
+SHOPPING_LIST_KEY = 'shopping_list:{}:{}'
+GENERATION_NAMESPACE = 'shopping_lists'
+
+
+def get_shopping_list_key(user_id):
+    """Возвращает ключ кэша списка покупок пользователя."""
+    return SHOPPING_LIST_KEY.format(
+        user_id, get_generation(GENERATION_NAMESPACE))
+
+
+def query_totals(user_id):
+    """Суммирует количества ингредиентов списка покупок одним запросом.
+
+    Возвращает QuerySet кортежей (название, единица, количество),
+    отсортированных по названию и единице.
+    """
+    return (
+        RecipeIngredient.objects
+        .filter(recipe_id__in=ShoppingList.objects.filter(
+            user_id=user_id).values('recipe_id'))
+        .values('ingredient_id')
+        .annotate(name=F('ingredient__name'), unit=F('ingredient__unit'),
+                  total=Sum('amount'))
+        .order_by('name', 'unit')
+        .values_list('name', 'unit', 'total')
+    )
+
+
+def merge_units(rows):
+    """Объединяет количества одного ингредиента в совместимых единицах.
+
+    Строки должны быть отсортированы по названию. Если ингредиент
+    встречается в нескольких единицах из `UNIT_CONVERSIONS`, они
+    переводятся в базовую единицу. Ингредиент в одной единице
+    остаётся без изменений.
+    """
+    for name, group in groupby(rows, key=lambda row: row[0]):
+        group = list(group)
+        if len(group) == 1:
+            yield group[0]
+            continue
+        totals = {}
+        units = {}
+        for _, unit, amount in group:
+            base_unit, factor = UNIT_CONVERSIONS.get(unit, (unit, 1))
+            totals[base_unit] = totals.get(base_unit, 0) + amount * factor
+            units.setdefault(base_unit, set()).add(unit)
+        for base_unit, amount in totals.items():
+            if len(units[base_unit]) == 1:
+                unit = units[base_unit].pop()
+                amount //= UNIT_CONVERSIONS.get(unit, (unit, 1))[1]
+            else:
+                unit = base_unit
+            yield name, unit, amount
+
+
+def get_shopping_list(user_id):
+    """Возвращает сводный список покупок пользователя.
+
+    Строки — кортежи (название, единица, количество). Из кэша
+    возвращается готовый список, при промахе — итератор по строкам
+    из БД.
+    """
+    key = get_shopping_list_key(user_id)
+    rows = get_cache().get(key)
+    if rows is None:
+        rows = stream_shopping_list(user_id, key)
+    return rows
+
+
+def stream_shopping_list(user_id, key):
+    """Отдаёт строки списка покупок по мере чтения из курсора БД.
+
+    Если список дочитан до конца и в нём не больше
+    `SHOPPING_LIST_CACHE_MAX_ROWS` строк, он сохраняется в кэш.
+    """
+    cached = []
+    for row in merge_units(query_totals(user_id).iterator(
+            chunk_size=SHOPPING_CART_CHUNK_SIZE)):
+        if cached is not None:
+            cached.append(row)
+            if len(cached) > SHOPPING_LIST_CACHE_MAX_ROWS:
+                cached = None
+        yield row
+    if cached is not None:
+        get_cache().set(key, cached, timeout=SHOPPING_LIST_CACHE_TIMEOUT)
+
+
+def invalidate_shopping_list(user_id):
+    """Удаляет список покупок пользователя из кэша после коммита."""
+    transaction.on_commit(
+        lambda: get_cache().delete(get_shopping_list_key(user_id)))
+
+
+def invalidate_all_shopping_lists():
+    """Сбрасывает кэш списков покупок всех пользователей после коммита."""
+    transaction.on_commit(lambda: bump_generation(GENERATION_NAMESPACE))
@@ -0,0 +1,202 @@
+"""Модуль обработчиков сигналов моделей рецептов."""
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from recipes.cache import bump_generation_on_commit
+from recipes.constants import AVATAR_IMAGE_SIZES, RECIPE_IMAGE_SIZES
+from recipes.counters import change_counter
+from recipes.images import schedule_derivatives
+from recipes.models import (FavoriteRecipe, Ingredient, Recipe,
+                            RecipeIngredient, ShoppingList, Subscription, Tag)
+from recipes.search import delete_from_search_index, update_search_index
+from recipes.shopping_list import (invalidate_all_shopping_lists,
+                                   invalidate_shopping_list)
+from recipes.timeline import (fan_out, fill_timelines, remove_author,
+                              update_author_fanout)
+from recipes.user_state import STATE_LINKS, invalidate_user_state
+from users.models import User
+
+
+@receiver([post_save, post_delete], sender=Ingredient)
+def invalidate_ingredients(sender, **kwargs):
+    """Сбрасывает кэш справочника и индекс автодополнения ингредиентов."""
+    bump_generation_on_commit('ingredients')
+
+
+@receiver(post_save, sender=Ingredient)
+def reindex_ingredient_recipes(sender, instance, created, **kwargs):
+    """Обновляет поисковый индекс рецептов с переименованным ингредиентом."""
+    if not created:
+        update_search_index(RecipeIngredient.objects.filter(
+            ingredient=instance).values_list('recipe_id', flat=True))
+
+
+@receiver([post_save, post_delete], sender=Tag)
+def invalidate_tags(sender, **kwargs):
+    """Сбрасывает кэш справочника тегов."""
+    bump_generation_on_commit('tags')
+
+
+@receiver(post_save, sender=Recipe)
+def increment_recipes_count(sender, instance, created, **kwargs):
+    """Увеличивает счётчик рецептов автора."""
+    if created:
+        change_counter(User, instance.author_id, 'recipes_count', 1)
+
+
+@receiver(post_delete, sender=Recipe)
+def decrement_recipes_count(sender, instance, **kwargs):
+    """Уменьшает счётчик рецептов автора."""
+    change_counter(User, instance.author_id, 'recipes_count', -1)
+
+
+@receiver(post_save, sender=Recipe)
+def process_recipe_image(sender, instance, update_fields, **kwargs):
+    """Ставит в очередь построение уменьшенных копий фото рецепта."""
+    schedule_derivatives(instance, 'image', 'image_derivatives',
+                         RECIPE_IMAGE_SIZES, update_fields, 'recipes')
+
+
+@receiver(post_save, sender=User)
+def process_user_avatar(sender, instance, update_fields, **kwargs):
+    """Ставит в очередь построение уменьшенных копий аватара."""
+    schedule_derivatives(instance, 'avatar', 'avatar_derivatives',
+                         AVATAR_IMAGE_SIZES, update_fields, 'users')
+
+
+@receiver(post_save, sender=Recipe)
+def index_recipe(sender, instance, **kwargs):
+    """Обновляет поисковый индекс сохранённого рецепта."""
+    update_search_index([instance.pk])
+
+
+@receiver(post_delete, sender=Recipe)
+def unindex_recipe(sender, instance, **kwargs):
+    """Удаляет рецепт из поискового индекса."""
+    delete_from_search_index(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=RecipeIngredient)
+def reindex_recipe_ingredients(sender, instance, **kwargs):
+    """Обновляет поисковый индекс рецепта при изменении ингредиентов."""
+    update_search_index([instance.recipe_id])
+
+
+@receiver(post_save, sender=FavoriteRecipe)
+def increment_favorites_count(sender, instance, created, **kwargs):
+    """Увеличивает счётчик добавлений рецепта в избранное."""
+    if created:
+        change_counter(Recipe, instance.recipe_id, 'favorites_count', 1)
+
+
+@receiver(post_delete, sender=FavoriteRecipe)
+def decrement_favorites_count(sender, instance, **kwargs):
+    """Уменьшает счётчик добавлений рецепта в избранное."""
+    change_counter(Recipe, instance.recipe_id, 'favorites_count', -1)
+
+
+@receiver(post_save, sender=ShoppingList)
+def increment_shopping_cart_count(sender, instance, created, **kwargs):
+    """Увеличивает счётчик добавлений рецепта в список покупок."""
+    if created:
+        change_counter(Recipe, instance.recipe_id, 'shopping_cart_count', 1)
+
+
+@receiver(post_delete, sender=ShoppingList)
+def decrement_shopping_cart_count(sender, instance, **kwargs):
+    """Уменьшает счётчик добавлений рецепта в список покупок."""
+    change_counter(Recipe, instance.recipe_id, 'shopping_cart_count', -1)
+
+
+@receiver(post_save, sender=Subscription)
+def increment_subscribers_count(sender, instance, created, **kwargs):
+    """Увеличивает счётчик подписчиков автора."""
+    if created:
+        change_counter(User, instance.author_id, 'subscribers_count', 1)
+
+
+@receiver(post_delete, sender=Subscription)
+def decrement_subscribers_count(sender, instance, **kwargs):
+    """Уменьшает счётчик подписчиков автора."""
+    change_counter(User, instance.author_id, 'subscribers_count', -1)
+
+
+@receiver([post_save, post_delete], sender=FavoriteRecipe)
+@receiver([post_save, post_delete], sender=ShoppingList)
+@receiver([post_save, post_delete], sender=Subscription)
+def reset_user_state(sender, instance, **kwargs):
+    """Сбрасывает кэш состояния пользователя после изменения связи."""
+    _, user_field, _ = STATE_LINKS[sender]
+    invalidate_user_state(getattr(instance, user_field))
+
+
+@receiver(post_save, sender=ShoppingList)
+@receiver(post_delete, sender=ShoppingList)
+def reset_shopping_list(sender, instance, **kwargs):
+    """Сбрасывает кэш сводного списка покупок пользователя."""
+    invalidate_shopping_list(instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=Ingredient)
+@receiver([post_save, post_delete], sender=RecipeIngredient)
+def reset_all_shopping_lists(sender, **kwargs):
+    """Сбрасывает кэш всех списков покупок после смены ингредиентов."""
+    invalidate_all_shopping_lists()
+
+
+@receiver(post_save, sender=Recipe)
+def add_to_timelines(sender, instance, created, **kwargs):
+    """Добавляет новый рецепт в ленты подписчиков после коммита."""
+    if created:
+        transaction.on_commit(lambda: fan_out(instance))
+
+
+@receiver(post_save, sender=Subscription)
+def fill_subscriber_timeline(sender, instance, created, **kwargs):
+    """Добавляет в ленту подписчика последние рецепты автора."""
+    if created:
+        update_author_fanout(instance.author_id, 1)
+        fill_timelines([(instance.subscriber_id, instance.author_id)])
+
+
+@receiver(post_delete, sender=Subscription)
+def clear_subscriber_timeline(sender, instance, **kwargs):
+    """Убирает из ленты рецепты автора после отписки."""
+    remove_author(instance.subscriber_id, instance.author_id)
+    update_author_fanout(instance.author_id, -1)
+
+
+@receiver([post_save, post_delete], sender=Recipe)
+@receiver([post_save, post_delete], sender=RecipeIngredient)
+@receiver([post_save, post_delete], sender=Ingredient)
+@receiver([post_save, post_delete], sender=Tag)
+def invalidate_recipes(sender, **kwargs):
+    """Сбрасывает кэш ответов со списком и страницами рецептов."""
+    bump_generation_on_commit('recipes')
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_recipe_tags(sender, action, **kwargs):
+    """Сбрасывает кэш рецептов после изменения их тегов."""
+    if action.startswith('post_'):
+        bump_generation_on_commit('recipes')
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_recipes(sender, instance, created, update_fields,
+                              **kwargs):
+    """Сбрасывает кэш рецептов после изменения имени или аватара автора.
+
+    У нового пользователя ещё нет рецептов, а остальные поля профиля
+    (время входа, пароль, счётчики) в рецептах не выводятся. Если
+    значения полей автора до сохранения неизвестны, кэш сбрасывается.
+    """
+    if (update_fields is not None
+            and not set(update_fields) & set(User.AUTHOR_FIELDS)):
+        return
+    saved = instance.saved_author_fields
+    instance.saved_author_fields = instance.get_author_fields()
+    if not created and saved != instance.saved_author_fields:
+        bump_generation_on_commit('recipes')
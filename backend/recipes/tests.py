@@ -0,0 +1,127 @@
+"""Тесты сервисов приложения рецептов."""
+
+from unittest import mock
+
+from django.db import IntegrityError, transaction
+from django.test import TestCase
+
+from recipes.cache import get_cache, get_generation
+from recipes.models import (FavoriteRecipe, Ingredient, Recipe,
+                            RecipeIngredient, ShoppingList, Subscription)
+from recipes.shopping_list import get_shopping_list
+from recipes.user_state import (STATE_GENERATION, STATE_KEY, UserState,
+                                load_user_state)
+from users.models import User
+
+
+class RecipesTestCase(TestCase):
+    """Базовый класс тестов с автором, читателем и рецептами."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            email='author@example.com', username='author',
+            first_name='Автор', last_name='Тестовый', password='Pass-word-1')
+        cls.user = User.objects.create_user(
+            email='reader@example.com', username='reader',
+            first_name='Читатель', last_name='Тестовый',
+            password='Pass-word-1')
+        cls.recipes = [
+            Recipe.objects.create(
+                name=f'Рецепт {number}', text='Описание',
+                image='recipes/images/recipe.png', cooking_time=10,
+                author=cls.author)
+            for number in range(3)]
+
+    def setUp(self):
+        get_cache().clear()
+
+
+class ConstraintsTest(RecipesTestCase):
+    """Уникальность связей и запрет подписки на себя проверяет БД."""
+
+    def assert_integrity_error(self, model, **fields):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            model.objects.create(**fields)
+
+    def test_subscription_constraints(self):
+        Subscription.objects.create(subscriber=self.user, author=self.author)
+        self.assert_integrity_error(
+            Subscription, subscriber=self.user, author=self.author)
+        self.assert_integrity_error(
+            Subscription, subscriber=self.user, author=self.user)
+
+    def test_recipe_ingredient_is_unique(self):
+        ingredient = Ingredient.objects.create(name='Соль', unit='г')
+        RecipeIngredient.objects.create(
+            recipe=self.recipes[0], ingredient=ingredient, amount=5)
+        self.assert_integrity_error(
+            RecipeIngredient, recipe=self.recipes[0], ingredient=ingredient,
+            amount=10)
+
+
+class ShoppingListTest(RecipesTestCase):
+    """Сводный список покупок читается потоком и кэшируется целиком."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        flour = Ingredient.objects.create(name='Мука', unit='г')
+        flour_kg = Ingredient.objects.create(name='Мука', unit='кг')
+        salt = Ingredient.objects.create(name='Соль', unit='г')
+        RecipeIngredient.objects.bulk_create([
+            RecipeIngredient(recipe=cls.recipes[0], ingredient=flour,
+                             amount=500),
+            RecipeIngredient(recipe=cls.recipes[1], ingredient=flour_kg,
+                             amount=1),
+            RecipeIngredient(recipe=cls.recipes[1], ingredient=salt,
+                             amount=5),
+        ])
+        for recipe in cls.recipes[:2]:
+            ShoppingList.objects.create(user=cls.user, recipe=recipe)
+
+    def test_rows_are_streamed_then_cached(self):
+        rows = get_shopping_list(self.user.id)
+        self.assertNotIsInstance(rows, list)
+        expected = [('Мука', 'г', 1500), ('Соль', 'г', 5)]
+        self.assertEqual(list(rows), expected)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_shopping_list(self.user.id), expected)
+
+    def test_long_list_is_not_cached(self):
+        with mock.patch(
+                'recipes.shopping_list.SHOPPING_LIST_CACHE_MAX_ROWS', 1):
+            list(get_shopping_list(self.user.id))
+            self.assertNotIsInstance(get_shopping_list(self.user.id), list)
+
+
+class UserStateTest(RecipesTestCase):
+    """Кэш состояния пользователя не отдаёт устаревшие наборы."""
+
+    def test_large_ids(self):
+        item = 2 ** 40
+        state = UserState.from_cache(UserState(favorites=[item]).to_cache())
+        self.assertTrue(state.contains('favorites', item))
+
+    def test_change_invalidates_state_on_commit(self):
+        recipe = self.recipes[0]
+        self.assertFalse(
+            load_user_state(self.user.id).contains('favorites', recipe.id))
+        with self.captureOnCommitCallbacks(execute=True):
+            FavoriteRecipe.objects.create(user=self.user, recipe=recipe)
+            self.assertFalse(load_user_state(self.user.id).contains(
+                'favorites', recipe.id))
+        self.assertTrue(
+            load_user_state(self.user.id).contains('favorites', recipe.id))
+
+    def test_stale_load_is_not_served(self):
+        recipe = self.recipes[0]
+        generation = get_generation(STATE_GENERATION.format(self.user.id))
+        with self.captureOnCommitCallbacks(execute=True):
+            FavoriteRecipe.objects.create(user=self.user, recipe=recipe)
+        # Загрузка, прочитавшая БД до коммита, сохраняет состояние
+        # под поколением, которое было до изменения.
+        get_cache().set(STATE_KEY.format(self.user.id, generation),
+                        UserState().to_cache())
+        self.assertTrue(
+            load_user_state(self.user.id).contains('favorites', recipe.id))
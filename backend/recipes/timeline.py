@@ -0,0 +1,150 @@
+"""Модуль лент рецептов подписчиков.
+
+Лента хранится строками `TimelineEntry`: при публикации рецепта
+запись добавляется каждому подписчику автора (распространение при
+записи), а длина ленты ограничивается `TIMELINE_LENGTH`. Рецепты
+авторов с числом подписчиков больше `TIMELINE_FANOUT_LIMIT` в ленты
+не копируются и добавляются к ленте при чтении. Когда автор
+переходит этот порог, его строки удаляются из лент, а когда
+возвращается под порог, ленты подписчиков заполняются заново.
+"""
+
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Window
+from django.db.models.functions import RowNumber
+
+from recipes.constants import (TIMELINE_BATCH_SIZE, TIMELINE_FANOUT_LIMIT,
+                               TIMELINE_LENGTH, TIMELINE_TRIM_SLACK)
+from recipes.models import Recipe, Subscription, TimelineEntry
+from users.models import User
+
+
+def trim_timelines(subscriber_ids):
+    """Обрезает ленты, выросшие больше допустимой длины.
+
+    Чтобы не обрезать ленту при каждой вставке, это делается, только
+    когда она длиннее `TIMELINE_LENGTH` на `TIMELINE_TRIM_SLACK`.
+    """
+    overflowing = list(
+        TimelineEntry.objects.filter(subscriber_id__in=subscriber_ids)
+        .values('subscriber_id').annotate(total=Count('id'))
+        .filter(total__gt=TIMELINE_LENGTH + TIMELINE_TRIM_SLACK)
+        .values_list('subscriber_id', flat=True))
+    if not overflowing:
+        return
+    extra = TimelineEntry.objects.filter(
+        subscriber_id__in=overflowing
+    ).annotate(position=Window(
+        RowNumber(),
+        partition_by=F('subscriber_id'),
+        order_by=(F('creation_date').desc(), F('recipe_id').desc()))
+    ).filter(position__gt=TIMELINE_LENGTH).values_list('id', flat=True)
+    TimelineEntry.objects.filter(id__in=list(extra)).delete()
+
+
+def fan_out(recipe):
+    """Добавляет новый рецепт в ленты подписчиков автора."""
+    if recipe.author.subscribers_count > TIMELINE_FANOUT_LIMIT:
+        return
+    subscriber_ids = list(Subscription.objects.filter(
+        author_id=recipe.author_id).values_list('subscriber_id', flat=True))
+    for start in range(0, len(subscriber_ids), TIMELINE_BATCH_SIZE):
+        batch = subscriber_ids[start:start + TIMELINE_BATCH_SIZE]
+        TimelineEntry.objects.bulk_create([
+            TimelineEntry(subscriber_id=subscriber_id,
+                          author_id=recipe.author_id, recipe_id=recipe.id,
+                          creation_date=recipe.creation_date)
+            for subscriber_id in batch], ignore_conflicts=True)
+        trim_timelines(batch)
+
+
+def fill_timelines(links):
+    """Добавляет в ленты последние рецепты авторов подписок.
+
+    `links` — пары (подписчик, автор). Авторы, рецепты которых
+    добавляются при чтении, пропускаются.
+    """
+    author_ids = set(User.objects.filter(
+        id__in={author_id for _, author_id in links},
+        subscribers_count__lte=TIMELINE_FANOUT_LIMIT
+    ).values_list('id', flat=True))
+    if not author_ids:
+        return
+    recipes = defaultdict(list)
+    for recipe in Recipe.objects.latest_by_author(
+            author_ids, TIMELINE_LENGTH).only('id', 'author_id',
+                                              'creation_date'):
+        recipes[recipe.author_id].append(recipe)
+    entries = [
+        TimelineEntry(subscriber_id=subscriber_id, author_id=author_id,
+                      recipe_id=recipe.id,
+                      creation_date=recipe.creation_date)
+        for subscriber_id, author_id in links
+        for recipe in recipes[author_id]]
+    TimelineEntry.objects.bulk_create(
+        entries, batch_size=TIMELINE_BATCH_SIZE, ignore_conflicts=True)
+    subscriber_ids = sorted({subscriber_id for subscriber_id, _ in links})
+    for start in range(0, len(subscriber_ids), TIMELINE_BATCH_SIZE):
+        trim_timelines(subscriber_ids[start:start + TIMELINE_BATCH_SIZE])
+
+
+def remove_author(subscriber_id, author_id):
+    """Убирает рецепты автора из ленты отписавшегося пользователя."""
+    TimelineEntry.objects.filter(
+        subscriber_id=subscriber_id, author_id=author_id).delete()
+
+
+def rebuild_timelines(subscriber_ids):
+    """Заново собирает ленты пользователей по их подпискам."""
+    TimelineEntry.objects.filter(subscriber_id__in=subscriber_ids).delete()
+    fill_timelines(list(Subscription.objects.filter(
+        subscriber_id__in=subscriber_ids
+    ).values_list('subscriber_id', 'author_id')))
+
+
+def update_author_fanout(author_id, delta):
+    """Переключает способ доставки рецептов автора на пороге подписчиков.
+
+    Вызывается после изменения счётчика подписчиков на `delta`
+    в той же транзакции. Счётчик меняется по одному, поэтому каждое
+    значение на пороге видит ровно одна транзакция. Сами ленты
+    меняются после коммита, как и при публикации рецепта.
+    """
+    count = User.objects.filter(pk=author_id).values_list(
+        'subscribers_count', flat=True).first()
+    if delta > 0 and count == TIMELINE_FANOUT_LIMIT + 1:
+        transaction.on_commit(lambda: TimelineEntry.objects.filter(
+            author_id=author_id).delete())
+    elif delta < 0 and count == TIMELINE_FANOUT_LIMIT:
+        transaction.on_commit(lambda: fill_timelines(list(
+            Subscription.objects.filter(author_id=author_id).values_list(
+                'subscriber_id', 'author_id'))))
+
+
+def get_feed(user):
+    """Возвращает рецепты ленты пользователя.
+
+    Рецепты из строк ленты дополняются рецептами крупных авторов,
+    на которых подписан пользователь. Ключ сортировки ленты выводится
+    полями `feed_date` и `feed_recipe`: без крупных авторов это
+    скопированные в строку ленты дата и id рецепта, и лента читается
+    по индексу `timeline_feed_idx` без сортировки. Фильтр по ключу
+    тоже нужно задавать по этим полям: условие на
+    `timeline_entries__*` в отдельном `filter()` добавит второе
+    соединение с лентой.
+    """
+    large_authors = list(Subscription.objects.filter(
+        subscriber=user, author__subscribers_count__gt=TIMELINE_FANOUT_LIMIT
+    ).values_list('author_id', flat=True))
+    if not large_authors:
+        return Recipe.objects.filter(
+            timeline_entries__subscriber=user
+        ).annotate(feed_date=F('timeline_entries__creation_date'),
+                   feed_recipe=F('timeline_entries__recipe_id'))
+    return Recipe.objects.filter(
+        Q(id__in=TimelineEntry.objects.filter(
+            subscriber=user).values('recipe_id'))
+        | Q(author_id__in=large_authors)
+    ).annotate(feed_date=F('creation_date'), feed_recipe=F('id'))
@@ -0,0 +1,98 @@
+"""Модуль кэша состояния пользователя.
+
+Состояние — это id рецептов в избранном, id рецептов в списке покупок
+и id авторов, на которых подписан пользователь. Каждый набор хранится
+отсортированным массивом `array('q')`, поэтому проверка принадлежности
+— бинарный поиск в памяти без SQL. Состояние загружается один раз
+за запрос из общего кэша (при промахе — тремя запросами к БД).
+
+Ключ состояния содержит поколение пользователя, которое сигналы
+и массовые операции увеличивают после коммита изменения связей.
+Поколение читается до запросов к БД, поэтому состояние, загруженное
+одновременно с изменением, сохраняется под старым ключом и больше
+не читается, а одновременные изменения не перезаписывают друг друга.
+"""
+
+from array import array
+from bisect import bisect_left
+
+from recipes.cache import bump_generation_on_commit, get_cache, get_generation
+from recipes.constants import USER_STATE_CACHE_TIMEOUT
+from recipes.models import FavoriteRecipe, ShoppingList, Subscription
+
+STATE_GENERATION = 'user_state:{}'
+STATE_KEY = 'user_state:{}:{}'
+TYPECODE = 'q'
+
+# Модель связи → (набор, поле пользователя, поле элемента набора).
+STATE_LINKS = {
+    FavoriteRecipe: ('favorites', 'user_id', 'recipe_id'),
+    ShoppingList: ('cart', 'user_id', 'recipe_id'),
+    Subscription: ('following', 'subscriber_id', 'author_id'),
+}
+
+
+class UserState:
+    """Наборы избранного, списка покупок и подписок пользователя."""
+
+    __slots__ = ('favorites', 'cart', 'following')
+
+    def __init__(self, favorites=(), cart=(), following=()):
+        self.favorites = array(TYPECODE, sorted(favorites))
+        self.cart = array(TYPECODE, sorted(cart))
+        self.following = array(TYPECODE, sorted(following))
+
+    @classmethod
+    def from_cache(cls, value):
+        """Восстанавливает состояние из байтов, сохранённых в кэше."""
+        state = cls()
+        for kind, data in zip(cls.__slots__, value):
+            getattr(state, kind).frombytes(data)
+        return state
+
+    def to_cache(self):
+        """Возвращает компактное представление для общего кэша."""
+        return tuple(getattr(self, kind).tobytes() for kind in self.__slots__)
+
+    def contains(self, kind, item):
+        """Проверяет, есть ли `item` в наборе `kind`."""
+        values = getattr(self, kind)
+        position = bisect_left(values, item)
+        return position < len(values) and values[position] == item
+
+
+def load_user_state(user_id):
+    """Загружает состояние пользователя из общего кэша или из БД."""
+    cache = get_cache()
+    key = STATE_KEY.format(
+        user_id, get_generation(STATE_GENERATION.format(user_id)))
+    value = cache.get(key)
+    if value is not None:
+        return UserState.from_cache(value)
+    sets = {}
+    for model, (kind, user_field, item_field) in STATE_LINKS.items():
+        sets[kind] = model.objects.filter(
+            **{user_field: user_id}).values_list(item_field, flat=True)
+    state = UserState(**sets)
+    cache.set(key, state.to_cache(), timeout=USER_STATE_CACHE_TIMEOUT)
+    return state
+
+
+def get_user_state(request):
+    """Возвращает состояние текущего пользователя, загружая его раз за запрос.
+
+    Для анонимного пользователя возвращает `None`.
+    """
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return None
+    state = getattr(request, 'user_state', None)
+    if state is None:
+        state = load_user_state(user.pk)
+        request.user_state = state
+    return state
+
+
+def invalidate_user_state(user_id):
+    """Сбрасывает закэшированное состояние после коммита транзакции."""
+    bump_generation_on_commit(STATE_GENERATION.format(user_id))
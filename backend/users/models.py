@@ -35,9 +35,30 @@ class User(AbstractUser):
         upload_to='avatars/',
         blank=True,
         verbose_name='Аватар пользователя')
+    avatar_derivatives = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name='Уменьшенные копии аватара')
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество рецептов')
+    subscribers_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество подписчиков')
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения профиля')
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
+    # Поля профиля, которые выводятся в рецептах автора.
+    AUTHOR_FIELDS = ('username', 'first_name', 'last_name', 'avatar')
+
+    # Значения `AUTHOR_FIELDS` на момент загрузки или сохранения.
+    saved_author_fields = None
 
     class Meta:
         verbose_name = 'Пользователь'
@@ -46,3 +67,15 @@ class User(AbstractUser):
 
     def __str__(self):
         return self.username
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Запоминает загруженные значения полей автора."""
+        instance = super().from_db(db, field_names, values)
+        if set(cls.AUTHOR_FIELDS) <= set(field_names):
+            instance.saved_author_fields = instance.get_author_fields()
+        return instance
+
+    def get_author_fields(self):
+        """Возвращает текущие значения полей автора."""
+        return tuple(str(getattr(self, name)) for name in self.AUTHOR_FIELDS)